@@ -0,0 +1,80 @@
+"""Benchmark upy.copy.deepcopy on typical metadata and action inputs.
+
+Compares against the previous implementation, which went through the memo
+for every element. Run with `micropython bench/bench_copy.py` on the board,
+or with any CPython from the repository root.
+"""
+
+from timing import measure, report
+
+from upy.copy import deepcopy
+
+METADATA = {
+    "@type": "LevelProperty",
+    "title": "Brightness",
+    "type": "integer",
+    "description": "The level of light from 0-100",
+    "minimum": 0,
+    "maximum": 100,
+    "unit": "percent",
+    "links": [{"rel": "alternate", "href": "/brightness", "mediaType": "text/html"}],
+}
+
+ACTION_INPUT = {
+    "type": "object",
+    "required": ["brightness", "duration"],
+    "properties": {
+        "brightness": {"type": "integer", "minimum": 0, "maximum": 100},
+        "duration": {"type": "integer", "minimum": 1, "unit": "milliseconds"},
+        "steps": {"type": "array", "items": [0, 25, 50, 75, 100]},
+    },
+}
+
+
+def legacy_deepcopy(x, memo=None):
+    """deepcopy() as it was, memoizing every element including atoms."""
+    if memo is None:
+        memo = {}
+
+    d = id(x)
+    if d in memo:
+        return memo[d]
+
+    cls = type(x)
+    if cls is list:
+        y = []
+        memo[d] = y
+        for a in x:
+            y.append(legacy_deepcopy(a, memo))
+    elif cls is dict:
+        y = {}
+        memo[d] = y
+        for key, value in x.items():
+            y[legacy_deepcopy(key, memo)] = legacy_deepcopy(value, memo)
+    else:
+        y = x
+
+    if y is not x:
+        memo[d] = y
+        try:
+            memo[id(memo)].append(x)
+        except KeyError:
+            memo[id(memo)] = [x]
+    return y
+
+
+def main():
+    for name, value in (("metadata", METADATA), ("action input", ACTION_INPUT)):
+        report(
+            "legacy deepcopy, " + name, measure(lambda: legacy_deepcopy(value), 200)
+        )
+        report("deepcopy, " + name, measure(lambda: deepcopy(value), 200))
+
+    nested = []
+    for _ in range(500):
+        nested = [nested]
+    report("deepcopy, 500 levels", measure(lambda: deepcopy(nested), 20))
+
+
+if __name__ == "__main__":
+    main()
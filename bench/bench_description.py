@@ -0,0 +1,73 @@
+"""Benchmark building a thing description.
+
+Compares the frozen property descriptions against deep copying the metadata
+for every property on every request, as was done before. Run on the board
+with `micropython bench/bench_description.py`.
+"""
+
+from timing import measure, measure_alloc, report
+
+from property import Property
+from thing import Thing
+from upy.copy import deepcopy
+
+
+def make_thing(property_count):
+    thing = Thing("bench", "Bench")
+    for idx in range(property_count):
+        thing.add_property(
+            Property(
+                thing,
+                "channel{}".format(idx),
+                initial_value=0,
+                metadata={
+                    "@type": "LevelProperty",
+                    "title": "Channel {}".format(idx),
+                    "type": "number",
+                    "description": "Reading of one channel",
+                    "minimum": 0,
+                    "maximum": 100,
+                    "unit": "volt",
+                },
+            )
+        )
+    return thing
+
+
+def deepcopy_description(prop):
+    """Property.as_property_description as it was, deep copying metadata."""
+    description = deepcopy(prop.metadata)
+    if "links" not in description:
+        description["links"] = []
+    description["links"].append(
+        {"rel": "property", "href": prop.href,}
+    )
+    return description
+
+
+def main():
+    for property_count in (10, 50):
+        thing = make_thing(property_count)
+        properties = list(thing.properties.values())
+
+        # The descriptions are kept, so the host counts them
+        descriptions = [None] * (property_count + 1)
+
+        def before():
+            descriptions[0] = thing.as_thing_description()
+            for idx, prop in enumerate(properties):
+                descriptions[idx + 1] = deepcopy_description(prop)
+
+        def after():
+            descriptions[0] = thing.as_thing_description()
+
+        label = "{} properties".format(property_count)
+        report("TD, deepcopy, " + label, measure(before, 20))
+        report("TD, frozen, " + label, measure(after, 20))
+        for name, func in (("deepcopy", before), ("frozen", after)):
+            descriptions[:] = [None] * (property_count + 1)
+            report("TD alloc, {}, {}".format(name, label), measure_alloc(func), "B")
+
+
+if __name__ == "__main__":
+    main()
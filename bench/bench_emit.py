@@ -0,0 +1,56 @@
+"""Benchmark emitting an event to a single handler.
+
+Compares against the previous EventEmitter, which packed the arguments into
+a tuple and kept a list of handlers per event. Run with
+`micropython bench/bench_emit.py` on the board, or with any CPython from the
+repository root.
+"""
+
+from timing import measure, measure_alloc, report
+
+from upy.eventemitter import EventEmitter
+
+
+class LegacyEventEmitter:
+    def __init__(self):
+        self._events = {}
+
+    def on(self, event, handler):
+        events = self._events
+        if event not in events:
+            events[event] = []
+        events[event].append(handler)
+
+    def emit(self, event, *data):
+        events = self._events
+        if event not in events:
+            return
+        handlers = events[event]
+        for handler in handlers:
+            handler(data)
+
+
+def main():
+    for name, cls in (("legacy", LegacyEventEmitter), ("current", EventEmitter)):
+        # The handler keeps what it is passed, so the host counts it
+        received = [None] * 100
+        count = [0]
+
+        def handler(data):
+            received[count[0]] = data
+            count[0] = (count[0] + 1) % 100
+
+        emitter = cls()
+        emitter.on("update", handler)
+
+        def emit():
+            for _ in range(100):
+                emitter.emit("update", 1)
+
+        report("emit x100, " + name, measure(emit, 50))
+        received[:] = [None] * 100
+        report("emit x100 alloc, " + name, measure_alloc(emit), "B")
+
+
+if __name__ == "__main__":
+    main()
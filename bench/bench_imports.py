@@ -0,0 +1,79 @@
+"""Profile the time and heap taken to import each module of the package.
+
+Modules are imported leaves first, so each one is measured without the
+modules it imports. The modules loaded at boot are profiled first, then the
+optional ones, which are only imported once a client or a property needs
+them. Run with `micropython bench/bench_imports.py` on the board after a
+reset, so nothing is imported yet. Modules needing hardware or libraries
+missing from the host are reported as unavailable.
+"""
+
+import sys
+
+from timing import measure_alloc, report, ticks_diff, ticks_us
+
+# Modules imported at boot, in dependency order
+MODULES = (
+    "errors",
+    "routing",
+    "streaming",
+    "cache",
+    "connections",
+    "upy.logging",
+    "upy.eventemitter",
+    "utils",
+    "value",
+    "property",
+    "action",
+    "event",
+    "thing",
+    "persistence",
+    "definition",
+    "server",
+)
+
+# Modules only imported once a client or a property needs them
+OPTIONAL_MODULES = (
+    "cbor",
+    "compression",
+    "history",
+)
+
+
+def profile(names, label):
+    """Import modules one by one, reporting the time and heap each takes."""
+    total_time = 0
+    total_heap = 0
+    for name in names:
+        elapsed = []
+
+        def load():
+            start = ticks_us()
+            __import__(name)
+            elapsed.append(ticks_diff(ticks_us(), start))
+
+        try:
+            heap = measure_alloc(load)
+        except ImportError as err:
+            print("{:<40} unavailable ({})".format(name, err))
+            continue
+
+        total_time += elapsed[0]
+        total_heap += heap
+        report("import " + name, elapsed[0])
+        report("import heap " + name, heap, "B")
+
+    report("import total, " + label, total_time)
+    report("import heap total, " + label, total_heap, "B")
+
+
+def main():
+    profile(MODULES, "boot")
+    for name in OPTIONAL_MODULES:
+        if name in sys.modules:
+            print("{:<40} imported at boot".format(name))
+    profile(OPTIONAL_MODULES, "on first use")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark the memory taken by property, value, action and event objects.
+
+Reports the heap allocated by getting hrefs, as they were concatenated from
+a prefix and a suffix on every call before being precomputed, which is the
+saving on the board. Also reports bytes per object for the slotted
+classes, and for equivalent subclasses without __slots__, which carry a
+per-instance __dict__ as the classes did before; MicroPython doesn't support
+__slots__, so there both take the same. Run with
+`micropython bench/bench_memory.py` on the board, or with any CPython from
+the repository root.
+"""
+
+from timing import measure_alloc, report
+
+from action import ActionObject
+from event import Event
+from property import Property
+from thing import Thing
+from value import Value
+
+# Number of objects created per measurement
+_COUNT = 100
+
+
+class DictProperty(Property):
+    pass
+
+
+class DictValue(Value):
+    pass
+
+
+class DictActionObject(ActionObject):
+    pass
+
+
+class DictEvent(Event):
+    pass
+
+
+def per_object(factory):
+    objects = []
+
+    def create():
+        for idx in range(_COUNT):
+            objects.append(factory(idx))
+
+    allocated = measure_alloc(create)
+    return allocated / _COUNT
+
+
+def href_alloc(thing):
+    prop = Property(thing, "level", initial_value=0)
+    thing.add_property(prop)
+    thing.set_href_prefix("/0")
+    prefix = "/0"
+    suffix = "/properties/level"
+
+    # Every href is kept, so the host counts the concatenated ones too
+    hrefs = [None] * _COUNT
+
+    def concatenated():
+        for idx in range(_COUNT):
+            hrefs[idx] = prefix + suffix
+
+    def precomputed():
+        for idx in range(_COUNT):
+            hrefs[idx] = prop.get_href()
+
+    for name, func in (("concatenated", concatenated), ("precomputed", precomputed)):
+        allocated = measure_alloc(func)
+        report("get_href alloc, " + name, allocated / _COUNT, "B")
+        hrefs[:] = [None] * _COUNT
+
+
+def main():
+    href_alloc(Thing("hrefs", "Hrefs"))
+
+    thing = Thing("bench", "Bench")
+
+    def noop(input_):
+        pass
+
+    cases = (
+        (
+            "Property",
+            lambda cls: lambda idx: cls(thing, "p{}".format(idx), initial_value=0),
+            Property,
+            DictProperty,
+        ),
+        ("Value", lambda cls: lambda idx: cls(initial_value=idx), Value, DictValue),
+        (
+            "ActionObject",
+            lambda cls: lambda idx: cls(thing, "fade", noop, None),
+            ActionObject,
+            DictActionObject,
+        ),
+        (
+            "Event",
+            lambda cls: lambda idx: cls(thing, "overheated", idx),
+            Event,
+            DictEvent,
+        ),
+    )
+
+    for name, make, slotted, plain in cases:
+        report(name + ", __dict__", per_object(make(plain)), "B")
+        report(name + ", __slots__", per_object(make(slotted)), "B")
+
+
+if __name__ == "__main__":
+    main()
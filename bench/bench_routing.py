@@ -0,0 +1,54 @@
+"""Benchmark route dispatch as the number of routes grows.
+
+Run with `micropython bench/bench_routing.py` on the board, or with any
+CPython from the repository root.
+"""
+
+from timing import measure, report
+
+from routing import Router
+
+
+def _handler(microWebSrv2, request, args=None):
+    pass
+
+
+def make_router(thing_count):
+    """Build a router serving thing_count things, the last one being probed."""
+    router = Router()
+    router.add("GET", "/", _handler)
+    for idx in range(thing_count):
+        prefix = "/{}".format(idx)
+        router.add("GET", prefix, _handler)
+        router.add("GET", prefix + "/properties", _handler)
+        router.add("GET", prefix + "/properties/<property_name>", _handler)
+        router.add("PUT", prefix + "/properties/<property_name>", _handler)
+        router.add("GET", prefix + "/actions", _handler)
+        router.add("POST", prefix + "/actions/<action_name>", _handler)
+        router.add("GET", prefix + "/actions/<action_name>/<action_id>", _handler)
+        router.add("GET", prefix + "/events/<event_name>", _handler)
+    return router
+
+
+def main():
+    for thing_count in (1, 10, 100):
+        router = make_router(thing_count)
+        route_count = sum(1 for _ in _walk(router.routes))
+        path = "/{}/actions/fade/0123abcd".format(thing_count - 1)
+        report(
+            "resolve, {} routes".format(route_count),
+            measure(lambda: router.resolve("GET", path)),
+        )
+
+
+def _walk(node):
+    for key, child in node.items():
+        if key == "":
+            yield child
+        else:
+            for entry in _walk(child):
+                yield entry
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Timing helpers shared by the benchmarks.
+
+Benchmarks run both on the board and on a host CPython, so the MicroPython
+tick functions, and an empty network module for the modules that import
+it, are emulated where they are missing.
+"""
+
+import gc
+import sys
+import time
+
+sys.path.append("/webthing")
+sys.path.append("webthing")
+
+if not hasattr(time, "ticks_ms"):
+    # Host CPython
+    time.ticks_ms = lambda: int(time.perf_counter() * 1000)
+    time.ticks_us = lambda: int(time.perf_counter() * 1000000)
+    time.ticks_diff = lambda end, start: end - start
+    time.ticks_add = lambda ticks, delta: ticks + delta
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+
+try:
+    import network  # noqa: F401
+except ImportError:
+    sys.modules["network"] = type(sys)("network")
+
+from time import ticks_us, ticks_diff  # noqa: E402
+
+
+def measure(func, iterations=1000):
+    """
+    Time repeated calls of a function.
+
+    func -- callable taking no arguments
+    iterations -- number of calls
+
+    Returns the mean time per call, in microseconds.
+    """
+    start = ticks_us()
+    for _ in range(iterations):
+        func()
+    return ticks_diff(ticks_us(), start) / iterations
+
+
+def measure_alloc(func):
+    """
+    Measure the heap allocated by one call of a function.
+
+    On the host, tracemalloc only reports the most memory in use at once, so
+    func must keep everything it allocates referenced until it returns, i.e.
+    in a list made beforehand, for it to be counted.
+
+    func -- callable taking no arguments
+
+    Returns the number of bytes allocated.
+    """
+    if hasattr(gc, "mem_alloc"):
+        # MicroPython: keep the collector from freeing anything meanwhile
+        gc.collect()
+        gc.disable()
+        try:
+            before = gc.mem_alloc()
+            func()
+            return gc.mem_alloc() - before
+        finally:
+            gc.enable()
+
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(name, value, unit="us"):
+    """Print a single benchmark result."""
+    print("{:<40} {:>10.2f} {}".format(name, value, unit))
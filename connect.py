@@ -4,6 +4,18 @@ import network
 import time
 import config
 
+import utils
+from upy import logging
+
+log = logging.getLogger(__name__)
+
+# Status of a station still associating, on ports that report it
+_STAT_CONNECTING = getattr(network, "STAT_CONNECTING", None)
+
+# First wait between connection attempts, in ms: longer than a WPA
+# association usually takes, so a slow access point isn't interrupted
+_FIRST_CONNECT_BACKOFF = 8000
+
 
 def start_ftp():
     print("Starting FTP...")
@@ -31,3 +43,120 @@ def connect_to_ap():
             print("")
     print("ifconfig =", station.ifconfig())
 
+
+class NetworkMonitor:
+    """
+    Connect to the access point and sync to NTP in the background.
+
+    Nothing here blocks for longer than one NTP request: poll() is meant to be
+    called periodically, i.e. from the server loop, and retries the connection
+    and the NTP sync with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        ssid=None,
+        password=None,
+        on_time_sync=None,
+        max_backoff=64,
+        started=None,
+    ):
+        """
+        Initialize the monitor.
+
+        ssid -- access point to connect to, defaults to config.SSID
+        password -- its password, defaults to config.PASSWORD
+        on_time_sync -- called with the clock correction in milliseconds
+                        whenever NTP sets the clock
+        max_backoff -- longest wait between retries, in seconds
+        started -- time.ticks_ms() boot phase timings are measured from,
+                   defaults to when start() is called
+        """
+        self.ssid = ssid if ssid is not None else config.SSID
+        self.password = password if password is not None else config.PASSWORD
+        self.on_time_sync = on_time_sync
+        self.max_backoff = max_backoff * 1000
+
+        self.station = network.WLAN(network.STA_IF)
+        self.connected = False
+        self.synced = False
+
+        # Boot phase timings, in ms since started
+        self.timings = {}
+        self.started = started
+
+        self.connect_backoff = _FIRST_CONNECT_BACKOFF
+        self.next_connect = time.ticks_ms()
+        self.ntp_backoff = 1000
+        self.next_ntp = self.next_connect
+
+    def mark(self, phase):
+        """Record and report the time a boot phase completed at."""
+        if phase not in self.timings:
+            self.timings[phase] = time.ticks_diff(time.ticks_ms(), self.started)
+            log.info("Boot phase %s done after %d ms", phase, self.timings[phase])
+
+    def start(self):
+        """Start connecting, without waiting for the connection."""
+        if self.started is None:
+            self.started = time.ticks_ms()
+        self.station.active(True)
+        self.poll()
+
+    def poll(self):
+        """
+        Drive the connection and NTP sync along.
+
+        Returns True while connected to the access point.
+        """
+        now = time.ticks_ms()
+        connected = self.station.isconnected()
+
+        if connected != self.connected:
+            self.connected = connected
+            if connected:
+                self.connect_backoff = _FIRST_CONNECT_BACKOFF
+                self.mark("wifi")
+                log.info("ifconfig = %s", self.station.ifconfig())
+            else:
+                log.warning("Connection lost")
+                self.next_connect = now
+
+        if not connected:
+            if (
+                time.ticks_diff(now, self.next_connect) >= 0
+                and (
+                    _STAT_CONNECTING is None
+                    or self.station.status() != _STAT_CONNECTING
+                )
+            ):
+                log.info("Connecting to %s", self.ssid)
+                try:
+                    self.station.connect(self.ssid, self.password)
+                except OSError as err:
+                    log.error("Connect failed: %s", str(err))
+                self.next_connect = time.ticks_add(now, self.connect_backoff)
+                self.connect_backoff = min(self.connect_backoff * 2, self.max_backoff)
+            return False
+
+        if not self.synced and time.ticks_diff(now, self.next_ntp) >= 0:
+            self.sync_ntp(now)
+
+        return True
+
+    def sync_ntp(self, now):
+        """Try to set the clock from NTP once, scheduling a retry on failure."""
+        try:
+            ntptime.settime()
+        except Exception as err:
+            log.warning("NTP sync failed: %s", str(err))
+            self.next_ntp = time.ticks_add(now, self.ntp_backoff)
+            self.ntp_backoff = min(self.ntp_backoff * 2, self.max_backoff)
+            return
+
+        self.synced = True
+        self.mark("ntp")
+        correction = utils.sync_clock()
+        log.info("Time: %s", time.localtime())
+        if self.on_time_sync is not None:
+            self.on_time_sync(correction)
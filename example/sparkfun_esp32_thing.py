@@ -142,7 +142,8 @@ def run_server():
 
     led = Led(5, 0)
 
-    server = WebThingServer(led, "SparkFun-ESP32-Thing", port=80)
+    things = MultipleThings([led], "SparkFun-ESP32-Thing")
+    server = WebThingServer(things, port=80)
     try:
         log.info("starting the server")
         server.start()
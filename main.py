@@ -1,27 +1,25 @@
 import sys
+import time
+
+boot_started = time.ticks_ms()
 
 sys.path.append("/webthing")
 sys.path.append("/example")
 
-import logging
+from upy import logging
 import connect
 
-logging.basicConfig(level=logging.DEBUG)
+# Keep recent log records readable at /logs, and write them to the serial
+# console without holding up the caller
+logging.basicConfig(level=logging.DEBUG, ring_size=64, threaded=True)
 log = logging.getLogger(__name__)
 
-connect.connect_to_ap()
-connect.start_ntp()
-
 from action import Action
 from property import Property
 from thing import Thing
 from value import Value
 from server import WebThingServer
-import logging
-import time
-import uuid
-
-log = logging.getLogger(__name__)
+from persistence import PropertyStore
 
 
 def make_thing():
@@ -42,6 +40,7 @@ def make_thing():
             "title": "On/Off",
             "type": "boolean",
             "description": "Whether the lamp is turned on",
+            "persist": True,
         },
     )
 
@@ -58,6 +57,7 @@ def make_thing():
             "minimum": 0,
             "maximum": 100,
             "unit": "percent",
+            "persist": True,
         },
     )
 
@@ -100,14 +100,34 @@ def make_thing():
     return thing
 
 
+def boot_phase(name):
+    log.info(
+        "Boot phase %s done after %d ms",
+        name,
+        time.ticks_diff(time.ticks_ms(), boot_started),
+    )
+
+
 def run_server():
     log.info("run_server")
 
     thing = make_thing()
+    # Bring the lamp back to its state before the reboot
+    store = PropertyStore()
+    store.attach(thing)
+    boot_phase("thing")
+
+    # Wi-Fi and NTP come up in the background, driven by the server loop,
+    # which starts listening once the network is up
+    monitor = connect.NetworkMonitor(
+        on_time_sync=thing.shift_timestamps, started=boot_started
+    )
+    monitor.start()
 
     # If adding more than one thing, use MultipleThings() with a name.
     # In the single thing case, the thing's name will be broadcast.
-    server = WebThingServer(thing)
+    server = WebThingServer(thing, network_monitor=monitor, property_store=store)
+    boot_phase("server")
     try:
         log.info("starting the server")
         server.start()
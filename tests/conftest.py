@@ -0,0 +1,14 @@
+"""Host stand-ins for the MicroPython modules webthing needs under pytest."""
+
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "webthing"))
+
+if not hasattr(time, "ticks_ms"):
+    time.ticks_ms = lambda: int(time.perf_counter() * 1000)
+    time.ticks_diff = lambda end, start: end - start
+    time.ticks_add = lambda ticks, delta: ticks + delta
+sys.modules.setdefault("network", types.ModuleType("network"))
@@ -0,0 +1,46 @@
+"""Tests of the property value log in webthing/persistence.py."""
+
+import pytest
+
+import persistence
+from persistence import PropertyStore
+
+
+class _Value:
+    def __init__(self, name, value):
+        self.owner = type("Owner", (), {"name": name})
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def test_failed_flush_keeps_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "state.log")
+    store = PropertyStore(path)
+    store.on_update(_Value("level", 1))
+
+    def full(*args):
+        raise OSError(28)
+
+    monkeypatch.setattr(persistence, "open", full, raising=False)
+    with pytest.raises(OSError):
+        store.flush()
+    monkeypatch.undo()
+
+    assert store.dirty == {"level": 1}
+    assert "level" not in store.saved
+    store.flush()
+    assert PropertyStore(path).saved == {"level": 1}
+
+
+def test_load_falls_back_to_compacted_log(tmp_path):
+    path = str(tmp_path / "state.log")
+    store = PropertyStore(path)
+    store.on_update(_Value("level", 2))
+    store.flush()
+    # A reset between removing the log and renaming the compacted one
+    (tmp_path / "state.log").rename(tmp_path / "state.log.tmp")
+
+    assert PropertyStore(path).saved == {"level": 2}
+    assert (tmp_path / "state.log").exists()
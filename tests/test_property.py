@@ -0,0 +1,34 @@
+"""Tests of the properties in webthing/property.py, run on the host."""
+
+import array
+import struct
+
+import pytest
+
+from errors import PropertyError
+from property import BulkProperty
+
+
+class _Thing:
+    def property_notify(self, property_):
+        pass
+
+
+_RAW = struct.pack("<4h", 1, -2, 3, -4)
+
+
+@pytest.mark.parametrize("convert", [bytes, bytearray, memoryview])
+def test_bulk_set_value_takes_raw_bytes(convert):
+    prop = BulkProperty(_Thing(), "wave", "h", (4,))
+    prop.set_value(convert(_RAW))
+
+    value = prop.get_value()
+    assert isinstance(value, array.array)
+    assert list(value) == list(struct.unpack("<4h", _RAW))
+
+
+@pytest.mark.parametrize("convert", [bytes, bytearray, memoryview])
+def test_bulk_set_value_rejects_wrong_size(convert):
+    prop = BulkProperty(_Thing(), "wave", "h", (4,))
+    with pytest.raises(PropertyError):
+        prop.set_value(convert(_RAW[:6]))
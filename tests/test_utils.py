@@ -0,0 +1,38 @@
+"""Tests of the clock in webthing/utils.py, run on the host with pytest."""
+
+import time
+
+import pytest
+
+import utils
+
+_DAY_MS = 24 * 60 * 60 * 1000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Drive ticks and the RTC from the test, as [ticks, RTC time in ms]."""
+    clock = [1000, 1700000000000]
+    monkeypatch.setattr(time, "ticks_ms", lambda: clock[0])
+    monkeypatch.setattr(time, "time_ns", lambda: clock[1] * 1000000)
+    return clock
+
+
+def test_timestamp_rebases_after_a_day(clock):
+    utils.sync_clock()
+    start = utils.timestamp()
+
+    clock[0] += _DAY_MS + 60 * 60 * 1000
+    clock[1] += _DAY_MS + 60 * 60 * 1000 + 250
+    later = utils.timestamp()
+
+    assert utils._base_ticks == clock[0]
+    assert later == clock[1]
+    assert later >= start
+
+
+def test_sync_clock_returns_correction(clock):
+    utils.sync_clock()
+    clock[0] += 5000
+    clock[1] += 4750
+    assert utils.sync_clock() == -250
@@ -0,0 +1,208 @@
+"""Compile a JSON thing definition into a Python module.
+
+Runs on the host, with CPython:
+
+    python tools/compile_thing.py example/lamp.json lamp_thing.py
+    mpy-cross lamp_thing.py
+
+The definition is a JSON object like:
+
+    {
+        "id": "urn:dev:ops:my-lamp-1234",
+        "title": "My Lamp",
+        "@type": ["OnOffSwitch", "Light"],
+        "description": "A web connected lamp",
+        "properties": {
+            "on": {"initial": true, "metadata": {"type": "boolean"}}
+        },
+        "actions": {"fade": {"title": "Fade"}},
+        "events": {"overheated": {"type": "number"}}
+    }
+
+The module is loaded on the board with definition.build_thing(). The links
+of property, action and event descriptions are worked out here, for an
+empty href prefix, and the checks of Property.validate_value() are unrolled
+into one validator function per property.
+"""
+
+import json
+import pprint
+import sys
+
+# Property types a metadata "type" may name, and the check of a value
+_TYPE_CHECKS = {
+    "null": ("value is not None", "Value must be null"),
+    "boolean": ("type(value) is not bool", "Value must be a boolean"),
+    "object": ("type(value) is not dict", "Value must be an object"),
+    "array": ("type(value) is not list", "Value must be an array"),
+    "number": ("type(value) not in (float, int)", "Value must be a number"),
+    "integer": ("type(value) is not int", "Value must be an integer"),
+    "string": ("type(value) is not str", "Value must be a string"),
+}
+
+
+def property_links(name, metadata):
+    """Get the links Property.freeze() adds to a property description."""
+    href = "/properties/" + name
+    links = [{"rel": "property", "href": href}]
+    if metadata.get("history"):
+        links.append({"rel": "history", "href": href + "/history"})
+    if metadata.get("rollup"):
+        links.append({"rel": "rollup", "href": href + "/rollup"})
+    return links
+
+
+def description_source(variable, metadata, links):
+    """
+    Generate the expression building a description from its metadata.
+
+    The description is a shallow copy of the metadata with all links filled
+    in, as built by utils.make_description(), so nested values are shared.
+    """
+    links = list(metadata.get("links", ())) + links
+    return "dict({}, links={})".format(variable, literal(links, 8))
+
+
+def compile_validator(function_name, metadata):
+    """
+    Generate a validator doing the checks of Property.validate_value().
+
+    Returns the source of the function.
+    """
+    lines = ["def {}(value):".format(function_name)]
+
+    def check(condition, message):
+        lines.append("    if {}:".format(condition))
+        lines.append("        raise PropertyError({!r})".format(message))
+
+    if "type" in metadata:
+        check(*_TYPE_CHECKS[metadata["type"]])
+    if metadata.get("readOnly"):
+        check("True", "Read-only property")
+    if "minimum" in metadata:
+        minimum = metadata["minimum"]
+        check(
+            "value < {!r}".format(minimum),
+            "Value less than minimum: {}".format(minimum),
+        )
+    if "maximum" in metadata:
+        maximum = metadata["maximum"]
+        check(
+            "value > {!r}".format(maximum),
+            "Value greater than maximum: {}".format(maximum),
+        )
+    if metadata.get("enum"):
+        enum = tuple(metadata["enum"])
+        check("value not in {!r}".format(enum), "Invalid enum value")
+
+    if len(lines) == 1:
+        lines.append("    pass")
+    return "\n".join(lines)
+
+
+def literal(value, indent):
+    """Format a JSON value as a Python literal."""
+    text = pprint.pformat(value, width=88 - indent, sort_dicts=False)
+    return text.replace("\n", "\n" + " " * indent)
+
+
+def compile_definition(definition, source_name):
+    """
+    Compile a thing definition.
+
+    definition -- the definition, as loaded from JSON
+    source_name -- name of the definition file, for the module docstring
+
+    Returns the source of the module.
+    """
+    out = [
+        '"""Thing definition compiled from {} by tools/compile_thing.py.'.format(
+            source_name
+        ),
+        "",
+        "Do not edit: edit the definition and compile it again.",
+        '"""',
+        "",
+        "from errors import PropertyError",
+        "",
+        "THING = {}".format(
+            literal(
+                {
+                    "id": definition["id"],
+                    "title": definition["title"],
+                    "type": definition.get("@type", []),
+                    "description": definition.get("description", ""),
+                },
+                0,
+            )
+        ),
+    ]
+
+    entries = {"PROPERTIES": [], "ACTIONS": [], "EVENTS": []}
+    for idx, (name, spec) in enumerate(definition.get("properties", {}).items()):
+        metadata = spec.get("metadata", {})
+        if "type" in metadata and metadata["type"] not in _TYPE_CHECKS:
+            raise ValueError(
+                "Property {}: unknown type {}".format(name, metadata["type"])
+            )
+
+        variable = "_PROPERTY_{}".format(idx)
+        function_name = "_validate_{}".format(idx)
+        out.extend(
+            [
+                "",
+                "{} = {}".format(variable, literal(metadata, 0)),
+                "",
+                "",
+                compile_validator(function_name, metadata),
+                "",
+            ]
+        )
+        entries["PROPERTIES"].append(
+            (
+                repr(name),
+                repr(spec.get("initial")),
+                variable,
+                description_source(
+                    variable, metadata, property_links(name, metadata)
+                ),
+                function_name,
+            )
+        )
+
+    interactions = (("ACTIONS", "actions", "action"), ("EVENTS", "events", "event"))
+    for constant, key, rel in interactions:
+        for idx, (name, metadata) in enumerate(definition.get(key, {}).items()):
+            variable = "_{}_{}".format(rel.upper(), idx)
+            out.extend(["", "{} = {}".format(variable, literal(metadata, 0))])
+            links = [{"rel": rel, "href": "/{}/{}".format(key, name)}]
+            entries[constant].append(
+                (repr(name), variable, description_source(variable, metadata, links))
+            )
+
+    for constant in ("PROPERTIES", "ACTIONS", "EVENTS"):
+        out.extend(["", "{} = (".format(constant)])
+        for fields in entries[constant]:
+            out.append("    (")
+            out.extend("        {},".format(field) for field in fields)
+            out.append("    ),")
+        out.append(")")
+
+    return "\n".join(out) + "\n"
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: compile_thing.py DEFINITION.json OUTPUT.py")
+        sys.exit(2)
+
+    source, target = sys.argv[1:]
+    with open(source) as f:
+        definition = json.load(f)
+
+    with open(target, "w") as f:
+        f.write(compile_definition(definition, source.replace("\\", "/")))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
 """High-level ActionObject base class implementation."""
 
-from utils import timestamp
-import upy.uuid
+from utils import format_timestamp, make_description, new_id, parse_id, timestamp
 
 
 class ActionObject:
     """An ActionObject represents an individual action on a thing."""
 
+    __slots__ = (
+        "id",
+        "thing",
+        "name",
+        "target_function",
+        "cancel_function",
+        "input",
+        "href",
+        "status",
+        "time_requested",
+        "time_completed",
+    )
+
     def __init__(self, thing, name, target, input_, cancel=None):
         """
         Initialize the object.
@@ -16,7 +28,7 @@ class ActionObject:
         name -- name of the action
         input_ -- any action inputs
         """
-        self.id = uuid.uuid4().hex
+        self.id = new_id()
         self.thing = thing
         self.name = name
 
@@ -24,8 +36,8 @@ class ActionObject:
         self.cancel_function = cancel
         self.input = input_
 
-        self.href_prefix = ""
-        self.href = "/actions/{}/{}".format(self.name, self.id)
+        # Full href, including the thing's prefix, see set_href_prefix()
+        self.href = "/actions/{}/{}".format(name, self.id)
         self.status = "created"
         self.time_requested = timestamp()
         self.time_completed = None
@@ -38,8 +50,8 @@ class ActionObject:
         """
         description = {
             self.name: {
-                "href": self.href_prefix + self.href,
-                "timeRequested": self.time_requested,
+                "href": self.href,
+                "timeRequested": format_timestamp(self.time_requested),
                 "status": self.status,
             },
         }
@@ -48,7 +60,9 @@ class ActionObject:
             description[self.name]["input"] = self.input
 
         if self.time_completed is not None:
-            description[self.name]["timeCompleted"] = self.time_completed
+            description[self.name]["timeCompleted"] = format_timestamp(
+                self.time_completed
+            )
 
         return description
 
@@ -58,7 +72,7 @@ class ActionObject:
 
         prefix -- the prefix
         """
-        self.href_prefix = prefix
+        self.href = "{}/actions/{}/{}".format(prefix, self.name, self.id)
 
     def get_id(self):
         """Get this action's ID."""
@@ -70,7 +84,7 @@ class ActionObject:
 
     def get_href(self):
         """Get this action's href."""
-        return self.href_prefix + self.href
+        return self.href
 
     def get_status(self):
         """Get this action's status."""
@@ -82,11 +96,13 @@ class ActionObject:
 
     def get_time_requested(self):
         """Get the time the action was requested."""
-        return self.time_requested
+        return format_timestamp(self.time_requested)
 
     def get_time_completed(self):
         """Get the time the action was completed."""
-        return self.time_completed
+        if self.time_completed is None:
+            return None
+        return format_timestamp(self.time_completed)
 
     def get_input(self):
         """Get the inputs for this action."""
@@ -101,7 +117,9 @@ class ActionObject:
         self.finish()
 
     def cancel(self):
-        self.cancel_function()
+        """Cancel performing the action."""
+        if self.cancel_function is not None:
+            self.cancel_function()
 
     def finish(self):
         """Finish performing the action."""
@@ -111,7 +129,19 @@ class ActionObject:
 
 
 class Action:
-    def __init__(self, thing, name, invokeaction=None, metadata=None):
+    def __init__(
+        self, thing, name, invokeaction=None, metadata=None, description=None
+    ):
+        """
+        Initialize the object.
+
+        thing -- the Thing this action belongs to
+        name -- name of the action
+        invokeaction -- Callable performing the action, taking its input
+        metadata -- action metadata, i.e. title, input, etc., as a dict
+        description -- the description, prebuilt for an empty href prefix,
+                       see definition.py
+        """
         self.thing = thing
         self.name = name
         self.href_prefix = ""
@@ -121,8 +151,71 @@ class Action:
         self.invokeaction_forwarder = invokeaction or (lambda: None)
 
         self.queue = []
+        # ID counter -> action object, see utils.parse_id
+        self.index = {}
+
+        self.description = description
+        if description is None:
+            self.build_description()
+
+    def set_href_prefix(self, prefix):
+        """
+        Set the prefix of any hrefs associated with this action.
+
+        The action description is rebuilt here, rather than for every
+        thing description.
+
+        prefix -- the prefix
+        """
+        if prefix == self.href_prefix:
+            return
+
+        self.href_prefix = prefix
+        self.build_description()
+
+        for action_obj in self.queue:
+            action_obj.set_href_prefix(prefix)
+
+    def build_description(self):
+        """Build the action description for the current href prefix."""
+        self.description = make_description(
+            self.metadata, [{"rel": "action", "href": self.href_prefix + self.href}]
+        )
+
+    def get_description(self):
+        """
+        Get the action description, for the thing description.
+
+        The description is shared, and must not be modified.
+        """
+        return self.description
 
     def invokeaction(self, input_):
-        action_obj = ActionObject(thing, name, self.invokeaction_forwarder, input_)
+        action_obj = ActionObject(
+            self.thing, self.name, self.invokeaction_forwarder, input_
+        )
         self.queue.append(action_obj)
+        self.index[parse_id(action_obj.id)] = action_obj
         return action_obj
+
+    def get(self, action_id):
+        """
+        Get an action object by ID.
+
+        action_id -- ID of the action object
+
+        Returns the action object if found, else None.
+        """
+        counter = parse_id(action_id)
+        if counter is None:
+            return None
+        return self.index.get(counter)
+
+    def remove(self, action_obj):
+        """
+        Remove an action object.
+
+        action_obj -- the action object to remove
+        """
+        self.queue.remove(action_obj)
+        self.index.pop(parse_id(action_obj.id), None)
@@ -0,0 +1,65 @@
+"""Response caching."""
+
+import json
+
+# Bodies smaller than this aren't worth compressing
+_MIN_COMPRESS_SIZE = 256
+
+
+class ResponseCache:
+    """
+    A cache of encoded JSON response bodies.
+
+    Each entry is stored for one revision of the data it was built from, as
+    JSON and lazily as each content encoding asked for, so that repeated
+    requests neither re-serialize nor re-compress the body.
+    """
+
+    def __init__(self, max_entries=8):
+        """
+        Initialize the object.
+
+        max_entries -- maximum number of cached responses
+        """
+        self.max_entries = max_entries
+        # key -> [revision, {encoding: body}]
+        self.entries = {}
+
+    def get(self, key, revision, build, encoding=None):
+        """
+        Get an encoded response body, building it if needed.
+
+        key -- identifies the response
+        revision -- version of the underlying data; a different revision than
+                    the cached one rebuilds the body
+        build -- callable returning the object to serialize as JSON
+        encoding -- preferred content encoding, or None for identity
+
+        Returns a tuple of (body, encoding), where encoding is None if the body
+        was not compressed.
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != revision:
+            if entry is None and len(self.entries) >= self.max_entries:
+                del self.entries[next(iter(self.entries))]
+            entry = [revision, {None: json.dumps(build()).encode()}]
+            self.entries[key] = entry
+
+        bodies = entry[1]
+        identity = bodies[None]
+        if encoding is None or len(identity) < _MIN_COMPRESS_SIZE:
+            return identity, None
+
+        body = bodies.get(encoding)
+        if body is None:
+            # Loaded by then, as negotiate() picked the encoding
+            from compression import compress
+
+            body = compress(identity, encoding)
+            bodies[encoding] = body
+
+        return body, encoding
+
+    def clear(self):
+        """Drop all cached responses."""
+        self.entries = {}
@@ -0,0 +1,224 @@
+"""A small CBOR (RFC 7049) encoder and decoder.
+
+Covers the data model of JSON, plus byte strings: integers, floats, strings,
+bytes, lists, dicts, booleans and None. Indefinite-length items and tags are
+not supported.
+"""
+
+import struct
+
+MEDIA_TYPE = "application/cbor"
+
+_FALSE = 0xF4
+_TRUE = 0xF5
+_NULL = 0xF6
+_FLOAT16 = 0xF9
+_FLOAT32 = 0xFA
+_FLOAT64 = 0xFB
+
+# Deepest nesting of arrays and maps decoded, to bound the recursion
+_MAX_DEPTH = 16
+
+# Raised by struct on CPython for truncated data; MicroPython raises
+# ValueError
+_STRUCT_ERROR = getattr(struct, "error", ValueError)
+
+
+def _head(out, major, n):
+    major <<= 5
+    if n < 24:
+        out.append(major | n)
+    elif n < 0x100:
+        out.append(major | 24)
+        out.append(n)
+    elif n < 0x10000:
+        out.append(major | 25)
+        out.extend(struct.pack(">H", n))
+    elif n < 0x100000000:
+        out.append(major | 26)
+        out.extend(struct.pack(">I", n))
+    else:
+        out.append(major | 27)
+        out.extend(struct.pack(">Q", n))
+
+
+def _encode_int(out, value):
+    if value >= 0:
+        _head(out, 0, value)
+    else:
+        _head(out, 1, -1 - value)
+
+
+def _encode_float(out, value):
+    # Use single precision whenever it represents the value exactly, which
+    # is always the case on ports with single precision floats
+    packed = struct.pack(">f", value)
+    if struct.unpack(">f", packed)[0] == value or value != value:
+        out.append(_FLOAT32)
+        out.extend(packed)
+    else:
+        out.append(_FLOAT64)
+        out.extend(struct.pack(">d", value))
+
+
+def _encode_str(out, value):
+    data = value.encode()
+    _head(out, 3, len(data))
+    out.extend(data)
+
+
+def _encode_bytes(out, value):
+    _head(out, 2, len(value))
+    out.extend(value)
+
+
+def _encode_list(out, value):
+    _head(out, 4, len(value))
+    for item in value:
+        _encode(out, item)
+
+
+def _encode_dict(out, value):
+    _head(out, 5, len(value))
+    for key, item in value.items():
+        _encode(out, key)
+        _encode(out, item)
+
+
+def _encode_bool(out, value):
+    out.append(_TRUE if value else _FALSE)
+
+
+def _encode_none(out, value):
+    out.append(_NULL)
+
+
+_encoders = {
+    int: _encode_int,
+    float: _encode_float,
+    str: _encode_str,
+    bytes: _encode_bytes,
+    bytearray: _encode_bytes,
+    list: _encode_list,
+    tuple: _encode_list,
+    dict: _encode_dict,
+    bool: _encode_bool,
+    type(None): _encode_none,
+}
+
+
+def _encode(out, value):
+    encoder = _encoders.get(type(value))
+    if encoder is None:
+        raise TypeError("Can't encode type {}".format(type(value)))
+    encoder(out, value)
+
+
+def dumps(value):
+    """
+    Encode a value as CBOR.
+
+    value -- the value to encode
+
+    Returns the encoded bytes.
+    """
+    out = bytearray()
+    _encode(out, value)
+    return bytes(out)
+
+
+def _float16(bits):
+    exponent = (bits >> 10) & 0x1F
+    fraction = bits & 0x3FF
+    if exponent == 0:
+        value = fraction * 2.0 ** -24
+    elif exponent == 0x1F:
+        value = float("nan") if fraction else float("inf")
+    else:
+        value = (1024 + fraction) * 2.0 ** (exponent - 25)
+    return -value if bits & 0x8000 else value
+
+
+def _decode(data, offset, depth=0):
+    initial = data[offset]
+    major = initial >> 5
+    info = initial & 0x1F
+    offset += 1
+
+    if major == 7:
+        if initial == _FALSE:
+            return False, offset
+        if initial == _TRUE:
+            return True, offset
+        if initial == _NULL or initial == 0xF7:
+            return None, offset
+        if initial == _FLOAT16:
+            bits = struct.unpack_from(">H", data, offset)[0]
+            return _float16(bits), offset + 2
+        if initial == _FLOAT32:
+            return struct.unpack_from(">f", data, offset)[0], offset + 4
+        if initial == _FLOAT64:
+            return struct.unpack_from(">d", data, offset)[0], offset + 8
+        raise ValueError("Unsupported simple value: {}".format(initial))
+
+    if info < 24:
+        n = info
+    elif info == 24:
+        n = data[offset]
+        offset += 1
+    elif info == 25:
+        n = struct.unpack_from(">H", data, offset)[0]
+        offset += 2
+    elif info == 26:
+        n = struct.unpack_from(">I", data, offset)[0]
+        offset += 4
+    elif info == 27:
+        n = struct.unpack_from(">Q", data, offset)[0]
+        offset += 8
+    else:
+        raise ValueError("Indefinite length items are not supported")
+
+    if major == 0:
+        return n, offset
+    if major == 1:
+        return -1 - n, offset
+    if major == 2:
+        return bytes(data[offset : offset + n]), offset + n
+    if major == 3:
+        return str(bytes(data[offset : offset + n]), "utf-8"), offset + n
+    if major == 4 or major == 5:
+        if depth >= _MAX_DEPTH:
+            raise ValueError("CBOR nested too deeply")
+    if major == 4:
+        items = []
+        for _ in range(n):
+            item, offset = _decode(data, offset, depth + 1)
+            items.append(item)
+        return items, offset
+    if major == 5:
+        items = {}
+        for _ in range(n):
+            key, offset = _decode(data, offset, depth + 1)
+            items[key], offset = _decode(data, offset, depth + 1)
+        return items, offset
+
+    raise ValueError("Tags are not supported")
+
+
+def loads(data):
+    """
+    Decode a CBOR encoded value.
+
+    data -- bytes-like object holding exactly one encoded value
+
+    Returns the decoded value. Raises ValueError if the data is malformed.
+    """
+    data = memoryview(data)
+    try:
+        value, offset = _decode(data, 0)
+    except (IndexError, TypeError, UnicodeError, _STRUCT_ERROR) as err:
+        # Truncated data, unhashable map keys or invalid UTF-8
+        raise ValueError("Malformed CBOR: {}".format(err))
+    if offset != len(data):
+        raise ValueError("Extra data after CBOR value")
+    return value
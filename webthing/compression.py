@@ -0,0 +1,70 @@
+"""Content encoding negotiation and compression.
+
+Only imported once a client sends Accept-Encoding, see server.py, so the
+deflate module isn't probed for clients that never ask for compression.
+"""
+
+import io
+
+try:
+    import deflate
+except ImportError:
+    # Firmware built without compression support; responses stay identity
+    deflate = None
+
+# Supported Content-Encodings, in order of preference
+if deflate is not None:
+    _FORMATS = (("gzip", deflate.GZIP), ("deflate", deflate.ZLIB))
+else:
+    _FORMATS = ()
+
+def negotiate(accept_encoding):
+    """
+    Pick a content encoding the client accepts.
+
+    accept_encoding -- value of the Accept-Encoding header
+
+    Returns the encoding name, or None for identity.
+    """
+    if not accept_encoding:
+        return None
+
+    # Encoding name -> quality, leaving out those refused with q=0
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        parts = item.split(";")
+        quality = 1.0
+        for param in parts[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[parts[0].strip()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    for name, _ in _FORMATS:
+        if accepted.get(name, wildcard) > 0:
+            return name
+
+    return None
+
+
+def compress(data, encoding):
+    """
+    Compress data.
+
+    data -- bytes to compress
+    encoding -- one of the names returned by negotiate()
+
+    Returns the compressed bytes.
+    """
+    for name, format_ in _FORMATS:
+        if name == encoding:
+            stream = io.BytesIO()
+            with deflate.DeflateIO(stream, format_) as compressor:
+                compressor.write(data)
+            return stream.getvalue()
+
+    raise ValueError("Unsupported encoding: {}".format(encoding))
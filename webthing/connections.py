@@ -0,0 +1,171 @@
+"""Keep-alive connection bookkeeping."""
+
+import _thread
+import time
+
+
+class ConnectionPool:
+    """
+    Track the client connections a server is handling.
+
+    Connections are identified by their MicroWebSrv2 XAsyncTCPClient, and are
+    seen once per request. A connection is forgotten as soon as its client
+    closes it. Connections that stay idle are closed by MicroWebSrv2 itself
+    after its request timeout; this pool only keeps count, and closes idle
+    connections early when a slot or memory is needed.
+    """
+
+    def __init__(self, max_connections=8, idle_timeout=5):
+        """
+        Initialize the object.
+
+        max_connections -- maximum number of concurrent connections
+        idle_timeout -- seconds a kept-alive connection may wait for its next
+                        request
+        """
+        self.max_connections = max_connections
+        self.idle_timeout_ms = idle_timeout * 1000
+
+        # id(client) -> [client, ticks_ms of its last request]
+        self.connections = {}
+        # admit() runs on the server thread, reaping on the main thread
+        self.lock = _thread.allocate_lock()
+
+        self.requests = 0
+        self.reused = 0
+        self.reaped = 0
+        self.rejected = 0
+
+    def admit(self, client):
+        """
+        Account for a request arriving on a connection.
+
+        client -- the connection the request arrived on
+
+        Returns False if the request is on a new connection and no slot could
+        be freed for it.
+        """
+        with self.lock:
+            admitted, closing = self._admit(client, time.ticks_ms())
+        self._close(closing)
+        return admitted
+
+    def _admit(self, client, now):
+        # Returns whether the client was admitted, and the connections reaped
+        # for it, to be closed once the lock is released
+        key = id(client)
+        entry = self.connections.get(key)
+
+        if entry is not None:
+            entry[1] = now
+            self.requests += 1
+            self.reused += 1
+            return True, ()
+
+        self._prune(now)
+        closing = ()
+        if len(self.connections) >= self.max_connections:
+            # Make room by closing the connection idle the longest, so that
+            # kept-alive clients can't starve new ones
+            closing = self._reap(1, now, 1000)
+            if not closing:
+                self.rejected += 1
+                return False, ()
+
+        self.connections[key] = [client, now]
+        self.requests += 1
+        self._watch(client)
+        return True, closing
+
+    def _watch(self, client):
+        # Release the slot when the connection closes, still calling any
+        # handler MicroWebSrv2 set
+        previous = client.OnClosed
+
+        def on_closed(xAsyncTCPClient, closedReason):
+            self.release(xAsyncTCPClient)
+            if previous is not None:
+                previous(xAsyncTCPClient, closedReason)
+
+        client.OnClosed = on_closed
+
+    def release(self, client):
+        """
+        Forget a connection that was closed.
+
+        client -- the closed connection
+        """
+        with self.lock:
+            entry = self.connections.get(id(client))
+            if entry is not None and entry[0] is client:
+                del self.connections[id(client)]
+
+    def prune(self, now=None):
+        """Forget connections MicroWebSrv2 has timed out by now."""
+        if now is None:
+            now = time.ticks_ms()
+        with self.lock:
+            self._prune(now)
+
+    def _prune(self, now):
+        expired = [
+            key
+            for key, (_, last) in self.connections.items()
+            if time.ticks_diff(now, last) > self.idle_timeout_ms
+        ]
+        for key in expired:
+            del self.connections[key]
+
+    def reap(self, count=None, now=None, min_idle_ms=1000):
+        """
+        Close idle connections, longest idle first.
+
+        count -- maximum number of connections to close, defaults to all
+        now -- current ticks_ms
+        min_idle_ms -- only close connections idle for at least this long
+
+        Returns the number of connections closed.
+        """
+        if now is None:
+            now = time.ticks_ms()
+        with self.lock:
+            closing = self._reap(count, now, min_idle_ms)
+        self._close(closing)
+        return len(closing)
+
+    def _reap(self, count, now, min_idle_ms):
+        idle = [
+            (time.ticks_diff(now, last), key)
+            for key, (_, last) in self.connections.items()
+            if time.ticks_diff(now, last) >= min_idle_ms
+        ]
+        idle.sort(reverse=True)
+        if count is not None:
+            idle = idle[:count]
+
+        self.reaped += len(idle)
+        return [self.connections.pop(key)[0] for _, key in idle]
+
+    def _close(self, clients):
+        # Called without the lock held, as closing calls release()
+        for client in clients:
+            try:
+                client.Close()
+            except Exception:
+                pass
+
+    def get_metrics(self):
+        """
+        Get connection statistics.
+
+        Returns a dictionary of counters, including the ratio of requests
+        served on a reused connection.
+        """
+        return {
+            "connections": len(self.connections),
+            "requests": self.requests,
+            "reused": self.reused,
+            "reuseRatio": self.reused / self.requests if self.requests else 0,
+            "reaped": self.reaped,
+            "rejected": self.rejected,
+        }
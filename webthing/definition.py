@@ -0,0 +1,64 @@
+"""Things built from compiled definitions.
+
+A thing can be declared in a JSON definition instead of code, and compiled
+on the host with tools/compile_thing.py into a Python module, which can be
+cross-compiled to .mpy or frozen into the firmware. The module holds the
+metadata, the prebuilt descriptions and a validator per property, so
+building the thing at boot only creates the objects and binds callbacks.
+"""
+
+from action import Action
+from property import Property
+from thing import Thing
+
+
+def build_thing(
+    definition, writers=None, readers=None, actions=None, thing_class=Thing
+):
+    """
+    Build a thing from a compiled definition.
+
+    definition -- the compiled definition module
+    writers -- dict of property name -> callable to pass value updates to
+    readers -- dict of property name -> callable to obtain the value
+    actions -- dict of action name -> callable performing the action
+    thing_class -- Thing subclass to instantiate
+
+    Returns the thing.
+    """
+    writers = writers or {}
+    readers = readers or {}
+    actions = actions or {}
+
+    info = definition.THING
+    thing = thing_class(info["id"], info["title"], info["type"], info["description"])
+
+    for name, initial_value, metadata, description, validator in definition.PROPERTIES:
+        thing.add_property(
+            Property(
+                thing,
+                name,
+                initial_value=initial_value,
+                writeproperty=writers.get(name),
+                readproperty=readers.get(name),
+                metadata=metadata,
+                description=description,
+                validator=validator,
+            )
+        )
+
+    for name, metadata, description in definition.ACTIONS:
+        thing.add_action(
+            Action(
+                thing,
+                name,
+                invokeaction=actions.get(name),
+                metadata=metadata,
+                description=description,
+            )
+        )
+
+    for name, metadata, description in definition.EVENTS:
+        thing.add_available_event(name, metadata, description)
+
+    return thing
@@ -5,3 +5,18 @@ class PropertyError(Exception):
     """Exception to indicate an issue with a property."""
 
     pass
+
+
+class HTTPError(Exception):
+    """Exception to abort a request handler with an HTTP error status."""
+
+    def __init__(self, status, message=None):
+        """
+        Initialize the object.
+
+        status -- HTTP status code to respond with
+        message -- short, human-readable reason sent back to the client
+        """
+        Exception.__init__(self, status, message)
+        self.status = status
+        self.message = message
@@ -1,11 +1,13 @@
 """High-level Event base class implementation."""
 
-from utils import timestamp
+from utils import format_timestamp, timestamp
 
 
 class Event:
     """An Event represents an individual event from a thing."""
 
+    __slots__ = ("thing", "name", "data", "time")
+
     def __init__(self, thing, name, data=None):
         """
         Initialize the object.
@@ -26,7 +28,7 @@ class Event:
         Returns a dictionary describing the event.
         """
         description = {
-            self.name: {"timestamp": self.time,},
+            self.name: {"timestamp": format_timestamp(self.time),},
         }
 
         if self.data is not None:
@@ -48,4 +50,4 @@ class Event:
 
     def get_time(self):
         """Get the event's timestamp."""
-        return self.time
+        return format_timestamp(self.time)
@@ -0,0 +1,266 @@
+"""Fixed-size time-series history of a property value."""
+
+import array
+import time
+
+from errors import PropertyError
+
+# Typecode of the value array and the type values are read back as, per
+# property type
+_TYPES = {
+    "number": ("f", float),
+    "integer": ("l", int),
+    "boolean": ("b", bool),
+}
+
+
+class History:
+    """
+    A ring buffer of (ticks, value) pairs.
+
+    Ticks and values are kept in two preallocated arrays, so recording a value
+    doesn't allocate and the memory used is fixed when the property is
+    created.
+    """
+
+    def __init__(self, size, type_):
+        """
+        Initialize the object.
+
+        size -- number of values to keep
+        type_ -- property type of the values, i.e. "number"
+        """
+        if type_ not in _TYPES:
+            raise PropertyError("History is not supported for type {}".format(type_))
+
+        typecode, self.cast = _TYPES[type_]
+        self.size = size
+        self.ticks = array.array("L", [0] * size)
+        self.values = array.array(typecode, [0] * size)
+        # Index the next value is written to, and number of values held
+        self.head = 0
+        self.count = 0
+
+    def record(self, value, ticks=None):
+        """
+        Record a value.
+
+        value -- the value
+        ticks -- time.ticks_ms() the value was taken at, defaults to now
+        """
+        if ticks is None:
+            ticks = time.ticks_ms()
+
+        head = self.head
+        self.ticks[head] = ticks
+        self.values[head] = value
+        self.head = (head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def query(self, since=None, limit=None):
+        """
+        Get recorded values, oldest first.
+
+        since -- only return values recorded after these ticks
+        limit -- only return up to this many of the most recent values
+
+        Returns a list of [ticks, value] pairs.
+        """
+        if limit is None or limit > self.count:
+            limit = self.count
+
+        items = []
+        idx = self.head
+        for _ in range(limit):
+            idx = (idx - 1) % self.size
+            ticks = self.ticks[idx]
+            if since is not None and time.ticks_diff(ticks, since) <= 0:
+                break
+            items.append([ticks, self.cast(self.values[idx])])
+
+        items.reverse()
+        return items
+
+
+# Property types rollups can aggregate
+_ROLLUP_TYPES = ("number", "integer")
+
+# Default rollup levels, as (resolution in ms, number of buckets): two minutes
+# at 1 s, two hours at 1 min and two days at 1 h
+DEFAULT_ROLLUPS = ((1000, 120), (60000, 120), (3600000, 48))
+
+
+class Rollup:
+    """
+    A ring buffer of min/max/sum/count aggregates over fixed time buckets.
+
+    Buckets start at the first value recorded after the previous bucket
+    ended, so periods without any value don't take up buckets.
+    """
+
+    def __init__(self, resolution, size):
+        """
+        Initialize the object.
+
+        resolution -- bucket length, in milliseconds
+        size -- number of buckets to keep
+        """
+        self.resolution = resolution
+        self.size = size
+        self.start = array.array("L", [0] * size)
+        self.min = array.array("f", [0] * size)
+        self.max = array.array("f", [0] * size)
+        self.sum = array.array("f", [0] * size)
+        self.count = array.array("L", [0] * size)
+        # Index of the current bucket, and number of buckets used
+        self.head = 0
+        self.used = 0
+
+    def add(self, value, ticks):
+        """
+        Aggregate a value into its bucket.
+
+        value -- the value
+        ticks -- time.ticks_ms() the value was taken at
+        """
+        idx = self.head
+        if (
+            self.used == 0
+            or time.ticks_diff(ticks, self.start[idx]) >= self.resolution
+        ):
+            if self.used:
+                idx = (idx + 1) % self.size
+                self.head = idx
+            if self.used < self.size:
+                self.used += 1
+            self.start[idx] = ticks
+            self.min[idx] = value
+            self.max[idx] = value
+            self.sum[idx] = value
+            self.count[idx] = 1
+            return
+
+        if value < self.min[idx]:
+            self.min[idx] = value
+        if value > self.max[idx]:
+            self.max[idx] = value
+        self.sum[idx] += value
+        self.count[idx] += 1
+
+    def span(self):
+        """Get the time covered when all buckets are used, in milliseconds."""
+        return self.resolution * self.size
+
+    def buckets(self, since):
+        """
+        Get the buckets started after given ticks, oldest first.
+
+        since -- time.ticks_ms() to start from
+
+        Returns a list of [start, min, max, sum, count] lists.
+        """
+        items = []
+        idx = self.head
+        for _ in range(self.used):
+            start = self.start[idx]
+            if time.ticks_diff(start, since) < 0:
+                break
+            items.append(
+                [start, self.min[idx], self.max[idx], self.sum[idx], self.count[idx]]
+            )
+            idx = (idx - 1) % self.size
+
+        items.reverse()
+        return items
+
+
+class Rollups:
+    """Rollups of a value stream at several resolutions, kept up incrementally."""
+
+    def __init__(self, levels, type_):
+        """
+        Initialize the object.
+
+        levels -- sequence of (resolution in ms, number of buckets) pairs,
+                  i.e. DEFAULT_ROLLUPS
+        type_ -- property type of the values, "number" or "integer"
+        """
+        if type_ not in _ROLLUP_TYPES:
+            raise PropertyError("Rollups are not supported for type {}".format(type_))
+
+        self.levels = sorted(
+            (Rollup(resolution, size) for resolution, size in levels),
+            key=lambda rollup: rollup.resolution,
+        )
+
+    def record(self, value, ticks=None):
+        """
+        Aggregate a value into every level.
+
+        value -- the value
+        ticks -- time.ticks_ms() the value was taken at, defaults to now
+        """
+        if ticks is None:
+            ticks = time.ticks_ms()
+
+        for rollup in self.levels:
+            rollup.add(value, ticks)
+
+    def select(self, span, points):
+        """
+        Pick the level to answer a query from.
+
+        Of the levels holding enough buckets to cover the span, this is the
+        coarsest one that still gives at least the requested number of
+        points, or the finest one if none does. If no level covers the span,
+        the coarsest level is used.
+
+        span -- time to cover, in milliseconds
+        points -- number of points wanted
+        """
+        covering = [rollup for rollup in self.levels if rollup.span() >= span]
+        if not covering:
+            return self.levels[-1]
+
+        for rollup in reversed(covering):
+            if span // rollup.resolution >= points:
+                return rollup
+
+        return covering[0]
+
+    def query(self, span, points, now=None):
+        """
+        Get aggregates of the values over a recent period.
+
+        Buckets of the selected level are merged, exactly, until no more than
+        the requested number of points are left.
+
+        span -- period to cover, in milliseconds up to now
+        points -- maximum number of points to return, at least 1
+        now -- current time.ticks_ms(), defaults to now
+
+        Returns a tuple of (resolution, items), where resolution is the length
+        of each point in milliseconds and items is a list of
+        [start, min, max, mean, count] lists, oldest first.
+        """
+        if now is None:
+            now = time.ticks_ms()
+
+        rollup = self.select(span, points)
+        buckets = rollup.buckets(time.ticks_add(now, -span))
+
+        # Number of buckets merged into each point, rounded up
+        group = max(1, -(-len(buckets) // points))
+        items = []
+        for offset in range(0, len(buckets), group):
+            merged = buckets[offset]
+            for bucket in buckets[offset + 1 : offset + group]:
+                merged[1] = min(merged[1], bucket[1])
+                merged[2] = max(merged[2], bucket[2])
+                merged[3] += bucket[3]
+                merged[4] += bucket[4]
+            merged[3] = merged[3] / merged[4]
+            items.append(merged)
+
+        return rollup.resolution * group, items
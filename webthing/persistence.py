@@ -0,0 +1,184 @@
+"""Persistence of property values across reboots."""
+
+import json
+import os
+import time
+
+from errors import PropertyError
+from upy import logging
+
+log = logging.getLogger(__name__)
+
+
+class PropertyStore:
+    """
+    Saves the values of a thing's properties to flash, and restores them.
+
+    Only properties whose metadata has a true "persist" entry are saved.
+    Changes are collected in RAM and appended to a log file in one write,
+    at most every flush_delay ms, so a burst of updates costs one flash
+    write. Each line of the log holds one [name, value] pair, the last one
+    for a name winning. Once the log grows past compact_size, it is rewritten
+    with only the current values.
+    """
+
+    def __init__(self, path="/state.log", flush_delay=5000, compact_size=4096):
+        """
+        Initialize the store, reading the saved values.
+
+        path -- log file to use
+        flush_delay -- ms to collect changes for before writing them
+        compact_size -- size in bytes the log is compacted at
+        """
+        self.path = path
+        self.flush_delay = flush_delay
+        self.compact_size = compact_size
+
+        # Name -> last saved value, and name -> value changed since
+        self.saved = {}
+        self.dirty = {}
+        # time.ticks_ms() of the oldest unsaved change
+        self.dirty_since = None
+        self.size = 0
+
+        # Bound once, to be subscribed to every persistent property
+        self.handler = self.on_update
+
+        self.load()
+
+    def load(self):
+        """Read the saved values from the log."""
+        try:
+            f = open(self.path)
+        except OSError:
+            # A reset between the remove and the rename in compact() leaves
+            # only the compacted log
+            try:
+                os.rename(self.path + ".tmp", self.path)
+                f = open(self.path)
+            except OSError:
+                return
+
+        with f:
+            for line in f:
+                self.size += len(line)
+                try:
+                    name, value = json.loads(line)
+                except (ValueError, TypeError):
+                    # A line cut short by a reset while it was written. The
+                    # next line would be appended to it, so compact instead.
+                    log.warning("Skipping corrupt line in %s", self.path)
+                    self.size += self.compact_size
+                    continue
+                self.saved[name] = value
+
+    def attach(self, thing):
+        """
+        Restore the persistent properties of a thing, and save their changes.
+
+        Call this before the server starts. Saved values are validated like
+        values set by clients, so read-only properties aren't restored, and
+        values the metadata no longer allows are skipped. Restored values are
+        set with Value.set(), so they are forwarded to the hardware.
+
+        thing -- the Thing
+        """
+        for property_ in thing.properties.values():
+            if property_.is_bulk or not property_.metadata.get("persist"):
+                continue
+
+            name = property_.name
+            if name in self.saved:
+                try:
+                    property_.validate_value(self.saved[name])
+                except PropertyError as err:
+                    log.warning("Not restoring %s: %s", name, str(err))
+                else:
+                    property_.value.set(self.saved[name])
+            property_.value.on("update", self.handler)
+
+    def on_update(self, value):
+        """
+        Collect a changed value, to be saved on the next flush.
+
+        value -- the Value that was updated
+        """
+        if self.dirty_since is None:
+            self.dirty_since = time.ticks_ms()
+        self.dirty[value.owner.name] = value.get()
+
+    def poll(self):
+        """Save the collected changes once they are flush_delay ms old."""
+        if (
+            self.dirty_since is not None
+            and time.ticks_diff(time.ticks_ms(), self.dirty_since) >= self.flush_delay
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Save the collected changes now.
+
+        Raises OSError if the log can't be written, e.g. when the flash is
+        full. The changes are then kept, to be saved by a later flush.
+        """
+        dirty = self.dirty
+        self.dirty = {}
+        self.dirty_since = None
+
+        changes = {
+            name: value
+            for name, value in dirty.items()
+            if self.saved.get(name) != value
+        }
+        if not changes:
+            return
+
+        try:
+            data = "".join(
+                json.dumps([name, value]) + "\n" for name, value in changes.items()
+            )
+            if self.size + len(data) > self.compact_size:
+                saved = dict(self.saved)
+                saved.update(changes)
+                self.compact(saved)
+            else:
+                with open(self.path, "a") as f:
+                    f.write(data)
+                self.size += len(data)
+        except OSError:
+            # Changes made since take precedence. A partial line may have
+            # been written, so compact on the next flush.
+            for name, value in dirty.items():
+                if name not in self.dirty:
+                    self.dirty[name] = value
+            self.dirty_since = time.ticks_ms()
+            self.size += self.compact_size
+            raise
+
+        self.saved.update(changes)
+
+    def compact(self, saved=None):
+        """
+        Rewrite the log with only the current values.
+
+        saved -- dict of name -> value to write, defaults to the saved values
+        """
+        if saved is None:
+            saved = self.saved
+        data = "".join(
+            json.dumps([name, value]) + "\n" for name, value in saved.items()
+        )
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(data)
+        # Renaming is atomic, so a reset leaves either the old or the new log
+        try:
+            os.rename(temp_path, self.path)
+        except OSError:
+            # Filesystems that don't rename over an existing file, i.e. FAT.
+            # A reset in between leaves only the new log, see load().
+            os.remove(self.path)
+            os.rename(temp_path, self.path)
+        self.size = len(data)
+        log.debug("Compacted %s to %d bytes", self.path, self.size)
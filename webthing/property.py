@@ -1,14 +1,37 @@
 """High-level Property base class implementation."""
 
-from upy.copy import deepcopy
+import array
 
 from value import Value
 from errors import PropertyError
+from utils import make_description
+
+
+# Property types a metadata "type" may name
+_TYPES = ("null", "boolean", "object", "array", "number", "integer", "string")
 
 
 class Property:
     """A Property represents an individual state value of a thing."""
 
+    __slots__ = (
+        "value",
+        "thing",
+        "name",
+        "href",
+        "metadata",
+        "description",
+        "validator",
+        "dependents",
+    )
+
+    # Whether the value is a binary buffer, see BulkProperty
+    is_bulk = False
+
+    # Position in the dependency graph of computed properties, see
+    # ComputedProperty
+    rank = 0
+
     def __init__(
         self,
         thing,
@@ -17,6 +40,8 @@ class Property:
         writeproperty=None,
         readproperty=None,
         metadata=None,
+        description=None,
+        validator=None,
     ):
         """
         Initialize the object.
@@ -26,23 +51,60 @@ class Property:
         writeproperty -- Callable to pass value updates to
         readproperty -- Callable to obtain the property value
         metadata -- property metadata, i.e. type, description, unit, etc.,
-                    as a dict
+                    as a dict. A "history" entry gives the number of recent
+                    values to keep, see get_history(). A "rollup" entry
+                    of True, or of a list of [resolution in ms, buckets]
+                    pairs, keeps aggregates of the values, see get_rollup().
+                    The metadata is frozen: later changes to the dict are not
+                    reflected in the property description.
+        description -- the description, prebuilt for an empty href prefix,
+                       see definition.py
+        validator -- callable validating new values in place of the checks
+                     of validate_value(), see definition.py
         """
         self.value = Value(
             initial_value=initial_value,
             read_forwarder=readproperty,
             write_forwarder=writeproperty,
         )
+        self.value.owner = self
+        # ComputedProperties using this property as an input, if any
+        self.dependents = None
+        self.validator = validator
 
         self.thing = thing
         self.name = name
-        self.href_prefix = ""
-        self.href = "/properties/{}".format(self.name)
+        # Full href, including the thing's prefix, see set_href_prefix()
+        self.href = "/properties/" + name
         self.metadata = metadata if metadata is not None else {}
 
-        # Add the property change observer to notify the Thing about a property
-        # change.
-        self.value.on("update", lambda _: self.thing.property_notify(self))
+        if not isinstance(self.metadata, dict):
+            raise PropertyError("Metadata must be a dict")
+        if "type" in self.metadata and self.metadata["type"] not in _TYPES:
+            raise PropertyError("Unknown type: {}".format(self.metadata["type"]))
+
+        # The history module is only loaded for properties asking for it
+        if self.metadata.get("history"):
+            from history import History
+
+            self.value.history = History(
+                self.metadata["history"], self.metadata.get("type")
+            )
+            if initial_value is not None:
+                self.value.history.record(initial_value)
+
+        rollup = self.metadata.get("rollup")
+        if rollup:
+            from history import DEFAULT_ROLLUPS, Rollups
+
+            self.value.rollups = Rollups(
+                DEFAULT_ROLLUPS if rollup is True else rollup, self.metadata.get("type")
+            )
+
+        if description is None:
+            self.freeze()
+        else:
+            self.description = description
 
     def validate_value(self, value):
         """
@@ -50,6 +112,10 @@ class Property:
 
         value -- New value
         """
+        if self.validator is not None:
+            self.validator(value)
+            return
+
         if "type" in self.metadata:
             t = self.metadata["type"]
 
@@ -95,21 +161,30 @@ class Property:
         ):
             raise PropertyError("Invalid enum value")
 
+    def link(self):
+        """Get the link to this property, as listed in its description."""
+        return {"rel": "property", "href": self.href}
+
+    def freeze(self):
+        """Build the property description, once per href prefix."""
+        href = self.href
+        links = [self.link()]
+        if self.value.history is not None:
+            links.append({"rel": "history", "href": href + "/history"})
+        if self.value.rollups is not None:
+            links.append({"rel": "rollup", "href": href + "/rollup"})
+
+        self.description = make_description(self.metadata, links)
+
     def as_property_description(self):
         """
         Get the property description.
 
+        The description is shared, and must not be modified.
+
         Returns a dictionary describing the property.
         """
-        description = deepcopy(self.metadata)
-
-        if "links" not in description:
-            description["links"] = []
-
-        description["links"].append(
-            {"rel": "property", "href": self.href_prefix + self.href,}
-        )
-        return description
+        return self.description
 
     def set_href_prefix(self, prefix):
         """
@@ -117,7 +192,10 @@ class Property:
 
         prefix -- the prefix
         """
-        self.href_prefix = prefix
+        href = "{}/properties/{}".format(prefix, self.name)
+        if href != self.href:
+            self.href = href
+            self.freeze()
 
     def get_href(self):
         """
@@ -125,7 +203,7 @@ class Property:
 
         Returns the href.
         """
-        return self.href_prefix + self.href
+        return self.href
 
     def get_value(self):
         """
@@ -144,6 +222,34 @@ class Property:
         self.validate_value(value)
         self.value.set(value)
 
+    def get_history(self, since=None, limit=None):
+        """
+        Get recent values of the property.
+
+        since -- only return values recorded after these time.ticks_ms()
+        limit -- only return up to this many of the most recent values
+
+        Returns a list of [ticks, value] pairs, oldest first, or None if the
+        property doesn't keep a history.
+        """
+        if self.value.history is None:
+            return None
+        return self.value.history.query(since, limit)
+
+    def get_rollup(self, span, points):
+        """
+        Get aggregates of the property value over a recent period.
+
+        span -- period to cover, in milliseconds up to now
+        points -- maximum number of points to return
+
+        Returns a tuple of (resolution, items) as returned by Rollups.query,
+        or None if the property doesn't keep rollups.
+        """
+        if self.value.rollups is None:
+            return None
+        return self.value.rollups.query(span, points)
+
     def get_name(self):
         """
         Get the name of this property.
@@ -159,3 +265,255 @@ class Property:
     def get_metadata(self):
         """Get the metadata associated with this property."""
         return self.metadata
+
+
+BULK_MEDIA_TYPE = "application/octet-stream"
+
+# Typecodes of array.array holding floating point numbers
+_FLOAT_DTYPES = "fd"
+
+
+class BulkProperty(Property):
+    """
+    A Property holding a fixed-size buffer of numbers, i.e. a waveform.
+
+    The value is an array.array of a declared dtype (typecode) and shape. It
+    is served as raw binary (application/octet-stream), and sent to websocket
+    subscribers as a propertyData message followed by one binary frame with
+    the raw buffer, without ever being converted to a list.
+    """
+
+    __slots__ = ("dtype", "shape", "length", "nbytes")
+
+    is_bulk = True
+
+    def __init__(
+        self,
+        thing,
+        name,
+        dtype,
+        shape,
+        writeproperty=None,
+        readproperty=None,
+        metadata=None,
+    ):
+        """
+        Initialize the object.
+
+        thing -- the Thing this property belongs to
+        name -- name of the property
+        dtype -- array.array typecode of the elements, i.e. "f" or "H"
+        shape -- tuple of dimensions; the buffer holds their product elements
+        writeproperty -- Callable to pass new buffers to
+        readproperty -- Callable to obtain the current buffer
+        metadata -- property metadata, i.e. description, unit, etc., as a dict
+        """
+        self.dtype = dtype
+        self.shape = tuple(shape)
+        self.length = 1
+        for dimension in self.shape:
+            self.length *= dimension
+
+        initial_value = array.array(dtype, [0] * self.length)
+        itemsize = len(bytes(array.array(dtype, [0])))
+        self.nbytes = self.length * itemsize
+
+        metadata = dict(metadata) if metadata is not None else {}
+        metadata["type"] = "array"
+        metadata["items"] = {
+            "type": "number" if dtype in _FLOAT_DTYPES else "integer",
+        }
+        metadata["minItems"] = self.length
+        metadata["maxItems"] = self.length
+        metadata["dtype"] = dtype
+        metadata["shape"] = list(self.shape)
+
+        Property.__init__(
+            self,
+            thing,
+            name,
+            initial_value=initial_value,
+            writeproperty=writeproperty,
+            readproperty=readproperty,
+            metadata=metadata,
+        )
+
+    def link(self):
+        """Get the link to this property, as listed in its description."""
+        link = Property.link(self)
+        link["mediaType"] = BULK_MEDIA_TYPE
+        return link
+
+    def get_data_description(self):
+        """Get the layout of the raw buffer, as sent ahead of binary frames."""
+        return {"dtype": self.dtype, "shape": self.shape, "length": self.nbytes}
+
+    def validate_value(self, value):
+        """
+        Validate a new buffer before setting it.
+
+        value -- New buffer
+        """
+        if "readOnly" in self.metadata and self.metadata["readOnly"]:
+            raise PropertyError("Read-only property")
+
+        if len(value) != self.length:
+            raise PropertyError("Value must have {} elements".format(self.length))
+
+    def set_value(self, value):
+        """
+        Set the buffer.
+
+        value -- raw bytes in the property's dtype, or a sequence of numbers
+        """
+        if not isinstance(value, array.array):
+            if isinstance(value, memoryview):
+                # array.array() takes bytes and bytearray as raw bytes, but
+                # reads a memoryview one byte per element
+                value = bytes(value)
+            if isinstance(value, (bytes, bytearray)):
+                if len(value) != self.nbytes:
+                    raise PropertyError(
+                        "Value must be {} bytes long".format(self.nbytes)
+                    )
+            try:
+                value = array.array(self.dtype, value)
+            except (TypeError, ValueError, OverflowError):
+                raise PropertyError("Value must be an array of numbers")
+
+        Property.set_value(self, value)
+
+    def update(self):
+        """Notify subscribers after the buffer was modified in place."""
+        self.thing.property_notify(self)
+
+
+# Computed properties waiting to be recomputed, and whether they are being
+# recomputed right now
+_pending = []
+_flushing = False
+
+
+def _rank(property_):
+    return property_.rank
+
+
+def _on_input_update(value):
+    # Subscribed once to each property used as an input. Every dependent is
+    # marked out of date before any is recomputed, so that each is
+    # recomputed once.
+    for dependent in value.owner.dependents:
+        dependent.invalidate()
+    _flush()
+
+
+def _flush():
+    """Recompute pending computed properties, inputs before dependents."""
+    global _flushing
+    if _flushing:
+        return
+
+    _flushing = True
+    try:
+        while _pending:
+            # Dependents queued while recomputing always rank higher than the
+            # property that queued them, so the lowest rank is always safe to
+            # recompute next
+            _pending.sort(key=_rank)
+            _pending.pop(0).refresh()
+    finally:
+        _flushing = False
+
+
+class ComputedProperty(Property):
+    """
+    A read-only Property whose value is computed from other properties.
+
+    The value is recomputed when one of its inputs is updated, at most once
+    per update however the properties depend on each other, and observers
+    are only notified if it changed. While nothing needs the value right away
+    (no subscribers to the thing, no history or rollups), recomputing is
+    deferred until the value is read.
+    """
+
+    __slots__ = ("inputs", "compute", "stale", "rank")
+
+    def __init__(self, thing, name, inputs, compute, metadata=None):
+        """
+        Initialize the object.
+
+        thing -- the Thing this property belongs to
+        name -- name of the property
+        inputs -- the Properties, computed or not, the value depends on
+        compute -- callable taking the input values, in order, and returning
+                   the value
+        metadata -- property metadata, i.e. type, description, unit, etc.,
+                    as a dict
+        """
+        metadata = dict(metadata) if metadata is not None else {}
+        metadata["readOnly"] = True
+
+        self.inputs = tuple(inputs)
+        self.compute = compute
+        self.stale = True
+        # Position in the dependency graph: inputs always rank lower
+        self.rank = 1 + max((input_.rank for input_ in self.inputs), default=0)
+
+        Property.__init__(self, thing, name, metadata=metadata)
+
+        for input_ in self.inputs:
+            if input_.dependents is None:
+                input_.dependents = []
+                input_.value.on("update", _on_input_update)
+            input_.dependents.append(self)
+
+        self.refresh()
+
+    def invalidate(self):
+        """Mark the value, and the values computed from it, out of date."""
+        if self in _pending:
+            # Its dependents were invalidated when it was queued
+            return
+
+        # A property left out of date while nothing needed it may be needed
+        # now, i.e. after a client subscribed, so it is queued all the same
+        self.stale = True
+        if self.is_eager():
+            _pending.append(self)
+        if self.dependents:
+            for dependent in self.dependents:
+                dependent.invalidate()
+
+    def is_eager(self):
+        """Whether the value must be recomputed as soon as an input changes."""
+        return (
+            bool(self.thing.subscribers)
+            or self.value.history is not None
+            or self.value.rollups is not None
+        )
+
+    def refresh(self):
+        """Recompute the value if it is out of date."""
+        if not self.stale:
+            return
+
+        value = self.compute(*[input_.get_value() for input_ in self.inputs])
+        self.stale = False
+        self.value.notify_of_external_update(value)
+
+    def get_value(self):
+        """
+        Get the current property value, recomputing it if needed.
+
+        Returns the value.
+        """
+        self.refresh()
+        return self.value.get()
+
+    def detach(self):
+        """Stop following the inputs, i.e. before discarding the property."""
+        for input_ in self.inputs:
+            input_.dependents.remove(self)
+            if not input_.dependents:
+                input_.dependents = None
+                input_.value.off("update", _on_input_update)
@@ -0,0 +1,123 @@
+"""Path based request dispatch."""
+
+from errors import HTTPError
+
+# Key of the child node matching any single path segment. Segments are always
+# strings, so this can never collide with a literal segment.
+_PARAM = None
+
+# Key of the handler entry in a node. Empty segments are dropped when a path is
+# split, so this can never collide with a literal segment either.
+_HANDLER = ""
+
+
+def split_path(path):
+    """
+    Split a request path into its segments.
+
+    path -- the path, i.e. /properties/on
+
+    Returns a list of non-empty segments.
+    """
+    path = path.strip("/")
+    if not path:
+        return []
+    return path.split("/")
+
+
+class Router:
+    """
+    Resolve request paths to handlers by nested dictionary lookup.
+
+    Routes are stored as a tree of dictionaries, keyed by method and then by
+    path segment, so resolving a path costs one lookup per segment no matter
+    how many routes are registered. Literal segments take precedence over
+    <parameter> segments, falling back to them when the rest of the path
+    doesn't match under the literal one.
+    """
+
+    def __init__(self):
+        """Initialize the object."""
+        self.routes = {}
+        self.depth = 0
+
+    def add(self, method, path, handler):
+        """
+        Add a route.
+
+        method -- HTTP method, i.e. GET
+        path -- route path, with parameter segments written as <name>
+        handler -- callable to resolve the route to
+        """
+        node = self.routes.setdefault(method.upper(), {})
+        segments = split_path(path)
+        names = []
+
+        for segment in segments:
+            if segment.startswith("<") and segment.endswith(">"):
+                names.append(segment[1:-1])
+                segment = _PARAM
+            node = node.setdefault(segment, {})
+
+        node[_HANDLER] = (handler, tuple(names))
+        self.depth = max(self.depth, len(segments))
+
+    def methods(self):
+        """Get the HTTP methods with at least one route."""
+        return list(self.routes.keys())
+
+    def _find(self, tree, segments):
+        values = []
+        entry = self._match(tree, segments, 0, values)
+        return entry, values
+
+    def _match(self, node, segments, index, values):
+        if index == len(segments):
+            return node.get(_HANDLER)
+
+        segment = segments[index]
+        child = node.get(segment)
+        if child is not None:
+            entry = self._match(child, segments, index + 1, values)
+            if entry is not None:
+                return entry
+
+        # Fall back to a parameter when the literal branch doesn't resolve,
+        # i.e. /0/properties with both /0/config and /<thing_id>/properties
+        child = node.get(_PARAM)
+        if child is None:
+            return None
+        values.append(segment)
+        entry = self._match(child, segments, index + 1, values)
+        if entry is None:
+            values.pop()
+        return entry
+
+    def resolve(self, method, path):
+        """
+        Resolve a request to its handler.
+
+        method -- HTTP method of the request
+        path -- path of the request
+
+        Returns a tuple of (handler, args), where args is a dictionary of
+        parameter name -> segment, or None if the route has no parameters.
+        Raises HTTPError 404 if no route matches the path, or 405 if routes
+        match it for other methods only.
+        """
+        segments = split_path(path)
+        tree = self.routes.get(method)
+
+        if tree is not None:
+            entry, values = self._find(tree, segments)
+            if entry is not None:
+                handler, names = entry
+                if not names:
+                    return handler, None
+                return handler, dict(zip(names, values))
+
+        for other, tree in self.routes.items():
+            if other != method and self._find(tree, segments)[0] is not None:
+                raise HTTPError(405)
+
+        raise HTTPError(404)
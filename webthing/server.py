@@ -2,21 +2,26 @@
 
 from MicroWebSrv2 import MicroWebSrv2, RegisterRoute
 import _thread
-import upy.logging
-import sys
+import json
+from upy import logging
 import network
-from time import sleep
+from time import sleep, ticks_ms
 
 import gc
 
-from errors import PropertyError
-from utils import get_addresses
+from errors import HTTPError, PropertyError
+from routing import Router
+from connections import ConnectionPool
+from cache import ResponseCache
+from streaming import GeneratorStream, byte_view, iter_buffer, iter_json
+from utils import get_addresses, timestamp
 from thing import Thing
+from property import BULK_MEDIA_TYPE
 
 log = logging.getLogger(__name__)
 
-# set to True to print WebSocket messages
-WS_messages = True
+# set to True to print the thread list when WebSockets open and close
+WS_messages = False
 
 # =================================================
 # Recommended configuration:
@@ -28,12 +33,67 @@ srv_run_in_thread = True
 # Run microWebSocket in thread
 ws_run_in_thread = False
 
+# Headers sent on CORS preflight responses. Access-Control-Allow-Origin is
+# added to every response, and Access-Control-Allow-Methods is derived from
+# the registered routes.
 _CORS_HEADERS = {
-    "Access-Control-Allow-Origin": "*",
     "Access-Control-Allow-Headers": "Origin, X-Requested-With, Content-Type, Accept",
-    "Access-Control-Allow-Methods": "GET, HEAD, PUT, POST, DELETE",
 }
 
+# How long browsers may cache a preflight response, in seconds
+_CORS_MAX_AGE = 7200
+
+
+# WebSocket subprotocol for CBOR encoded binary messages
+_WS_CBOR_PROTOCOL = "cbor"
+
+# cbor.MEDIA_TYPE, known without loading the cbor module. It is only
+# imported once a client asks for CBOR.
+_CBOR_MEDIA_TYPE = "application/cbor"
+
+# Longest error message sent back to a client, in characters
+_MAX_ERROR_MESSAGE = 64
+
+_STATUS_MESSAGES = {
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+def accepts(accept, media_type):
+    """
+    Check whether an Accept header asks for a media type.
+
+    accept -- value of the Accept header
+    media_type -- the media type, in lower case
+
+    Returns True if the media type is listed without q=0. Wildcards don't
+    count, as they are served the default type.
+    """
+    accept = accept.lower()
+    if media_type not in accept:
+        return False
+
+    for item in accept.split(","):
+        parts = item.split(";")
+        if parts[0].strip() != media_type:
+            continue
+        for param in parts[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    return float(param[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+
+    return False
+
 
 def print_exc(func):
     """Wrap a function and print an exception, if encountered."""
@@ -45,37 +105,154 @@ def print_exc(func):
             # log.debug('Back from {}'.format(func.__name__))
             return ret
         except Exception as err:
-            sys.print_exception(err)
+            log.exc(err, "Error in %s: %r", func.__name__, err)
 
     return wrapper
 
 
+def handle_errors(func):
+    """
+    Wrap a request handler so that it always sends a response.
+
+    HTTPError and PropertyError are turned into 4xx responses, anything else
+    into a 500. Errors are counted per handler on the server.
+    """
+    route = func.__name__
+
+    def wrapper(self, microWebSrv2, request, *args):
+        try:
+            return func(self, microWebSrv2, request, *args)
+        except HTTPError as err:
+            self.send_error(request, route, err.status, err.message)
+        except PropertyError as err:
+            self.send_error(request, route, 400, str(err))
+        except Exception as err:
+            log.exc(err, "Error in %s: %r", route, err)
+            self.send_error(request, route, 500)
+
+    return wrapper
+
+
+class SingleThing:
+    """A container for a single thing."""
+
+    def __init__(self, thing):
+        """
+        Initialize the container.
+
+        thing -- the thing to store
+        """
+        self.thing = thing
+
+    def get_thing(self, _=None):
+        """Get the thing at the given index."""
+        return self.thing
+
+    def get_things(self):
+        """Get the list of things."""
+        return [self.thing]
+
+    def get_name(self):
+        """Get the mDNS server name."""
+        return self.thing.title
+
+
+class MultipleThings:
+    """A container for multiple things."""
+
+    def __init__(self, things, name):
+        """
+        Initialize the container.
+
+        things -- the things to store
+        name -- the mDNS server name
+        """
+        self.things = list(things)
+        self.name = name
+
+        # Map the index segment of a route straight to its thing, so lookups
+        # don't need to parse or range-check the path
+        self.index = {str(idx): thing for idx, thing in enumerate(self.things)}
+
+        for idx, thing in enumerate(self.things):
+            thing.set_href_prefix("/{}".format(idx))
+
+    def get_thing(self, idx):
+        """
+        Get the thing at the given index.
+
+        idx -- the index, as it appears in the route
+
+        Returns the thing, or None if there is no thing at that index.
+        """
+        return self.index.get(str(idx))
+
+    def get_things(self):
+        """Get the list of things."""
+        return self.things
+
+    def get_name(self):
+        """Get the mDNS server name."""
+        return self.name
+
+
 class WebThingServer:
     """Server to represent a Web Thing over HTTP."""
 
     def __init__(
         self,
-        thing: Thing,
+        things,
         port: int = 80,
         hostname: str = None,
         ssl_options=None,
         additional_routes=None,
+        cors_origins=None,
+        cors_max_age=_CORS_MAX_AGE,
+        keep_alive=True,
+        keep_alive_timeout=5,
+        max_connections=8,
+        min_free_memory=16 * 1024,
+        max_body_size=4 * 1024,
+        network_monitor=None,
+        property_store=None,
     ):
         """
         Initialize the WebThingServer.
 
-        things -- list of Things managed by this server
+        things -- things managed by this server -- should be of type
+                  SingleThing or MultipleThings. A bare Thing is wrapped in
+                  a SingleThing.
         port -- port to listen on (defaults to 80)
         hostname -- Optional host name, i.e. mything.com
         ssl_options -- dict of SSL options to pass to the tornado server
         additional_routes -- list of additional routes to add to the server
+        cors_origins -- list of origins allowed to make cross-origin requests,
+                        defaults to allowing any origin
+        cors_max_age -- seconds browsers may cache a preflight response
+        keep_alive -- whether to keep connections open between requests
+        keep_alive_timeout -- seconds an idle connection is kept open
+        max_connections -- maximum number of concurrent connections
+        min_free_memory -- free heap, in bytes, below which idle connections
+                           are closed
+        max_body_size -- largest request body accepted, in bytes. Bodies of
+                         bulk properties are limited to their buffer size.
+        network_monitor -- optional object whose poll() method drives the
+                           network connection and returns whether it is up,
+                           see connect.NetworkMonitor. If given, the server
+                           only listens while the network is up.
+        property_store -- optional persistence.PropertyStore, flushed from
+                          the server loop and when the server stops
         """
         self.ssl_suffix = "" if ssl_options is None else "s"
 
-        self.thing = thing
-        self.name = thing.title
+        if isinstance(things, Thing):
+            things = SingleThing(things)
+
+        self.things = things
+        self.name = things.get_name()
         self.port = port
         self.hostname = hostname
+        self.error_counts = {}
 
         station = network.WLAN()
         mac = station.config("mac")
@@ -83,57 +260,104 @@ class WebThingServer:
             mac[3], mac[4], mac[5]
         )
 
-        self.hosts = [
+        # Hosts that don't depend on the network interface addresses
+        self.static_hosts = {
             "localhost",
             "localhost:{}".format(self.port),
             "{}.local".format(self.system_hostname),
             "{}.local:{}".format(self.system_hostname, self.port),
-        ]
-
-        for address in get_addresses():
-            self.hosts.extend(
-                [address, "{}:{}".format(address, self.port),]
-            )
+        }
 
         if self.hostname is not None:
             self.hostname = self.hostname.lower()
-            self.hosts.extend(
-                [self.hostname, "{}:{}".format(self.hostname, self.port),]
-            )
+            self.static_hosts.add(self.hostname)
+            self.static_hosts.add("{}:{}".format(self.hostname, self.port))
 
-        log.info("Registering a single thing")
-        handlers = [
-            ("/.*", "OPTIONS", self.optionsHandler),
-            ("/", "GET", self.thingGetHandler),
-            ("/properties", "GET", self.propertiesGetHandler),
-            ("/properties/<property_name>", "GET", self.propertyGetHandler),
-            ("/properties/<property_name>", "PUT", self.propertyPutHandler),
-        ]
+        self.addresses = None
+        self.hosts = set()
+        self.update_hosts()
+
+        # Serialized (and compressed) descriptions and lists, see sendCached
+        self.response_cache = ResponseCache()
+
+        if isinstance(self.things, MultipleThings):
+            log.info("Registering multiple things")
+            handlers = [("/", "GET", self.thingsGetHandler)]
+            handlers.extend(self.thingRoutes("/<thing_id>"))
+        else:
+            log.info("Registering a single thing")
+            handlers = self.thingRoutes("")
+
+        handlers.append(("/logs", "GET", self.logsGetHandler))
 
+        # Additional routes are added last, so they replace built-in routes
+        # with the same method and path
         if isinstance(additional_routes, list):
-            handlers = additional_routes + handlers
+            handlers.extend(additional_routes)
+
+        self.router = Router()
+        for path, method, handler in handlers:
+            log.debug("Adding route %s %s", method, path)
+            self.router.add(method, path, handler)
+
+        # Build the CORS headers once, rather than on every response
+        self.cors_origins = None if cors_origins is None else set(cors_origins)
+        methods = self.router.methods() + ["OPTIONS"]
+        self.cors_preflight_headers = tuple(_CORS_HEADERS.items()) + (
+            ("Access-Control-Allow-Methods", ", ".join(methods)),
+            ("Access-Control-Max-Age", str(cors_max_age)),
+        )
+
+        self.keep_alive = keep_alive
+        self.max_body_size = max_body_size
+        self.network_monitor = network_monitor
+        self.property_store = property_store
+        self.running = False
+        self.listening = False
+        self.min_free_memory = min_free_memory
+        self.connections = ConnectionPool(max_connections, keep_alive_timeout)
 
         self.server = MicroWebSrv2()
         self.server.SetEmbeddedConfig()
         self.server.BindAddress = ("0.0.0.0", self.port)
+        # One buffer slot per connection, with pending connections queued in
+        # the listen backlog in arrival order
+        self.server.BufferSlotsCount = max_connections
+        self.server.ConnQueueCapacity = max_connections
+        self.server.RequestsTimeoutSec = keep_alive_timeout
 
-        for handler in handlers:
-            print((handler[2], handler[1], handler[0]))
-            RegisterRoute(handler[2], handler[1], handler[0])
+        # MicroWebSrv2 only sees one generic route per method and path depth,
+        # and hands every request to the router
+        for method in methods:
+            RegisterRoute(self.dispatch, method, "/")
+            for depth in range(1, self.router.depth + 1):
+                path = "".join("/<s{}>".format(i) for i in range(depth))
+                RegisterRoute(self.dispatch, method, path)
 
-        wsMod = self.server.LoadModule("WebSockets")
-        wsMod.OnWebSocketAccepted = self._OnWebSocketAcceptedCallback
+        # The WebSockets module is only loaded on the first upgrade request,
+        # see loadWebSockets()
+        self.websockets = None
+        self.mdns = None
+
+    def listen(self):
+        """Start the listeners, if they aren't running."""
+        if self.listening:
+            return
 
-    def start(self):
-        """Start listening for incoming connections."""
         # If WebSocketS used and NOT running in thread, and WebServer IS
         # running in thread make shure WebServer has enough stack size to
         # handle also the WebSocket requests.
-        log.info("Starting Web Server on port {}".format(self.port))
+        log.info("Starting Web Server on port %d", self.port)
+        # MicroWebSrv2 rejects bodies over this size before reading them
+        self.server.MaxRequestContentLength = self.getMaxContentLength()
         self.server.StartManaged(procStackSize=12 * 1024)
+        self.listening = True
 
-        if hasattr(network, "mDNS"):
+        # Only some ports have mDNS, and it keeps running while the network
+        # comes and goes
+        if self.mdns is None and hasattr(network, "mDNS"):
             mdns = network.mDNS()
+            self.mdns = mdns
             mdns.start(self.system_hostname, "MicroPython with mDNS")
             mdns.addService(
                 "_labthing",
@@ -143,108 +367,658 @@ class WebThingServer:
                 {"board": "ESP32", "path": "/",},
             )
 
+    def unlisten(self):
+        """Stop the listeners, if they are running."""
+        if self.listening:
+            log.info("Stopping Web Server")
+            self.server.Stop()
+            self.listening = False
+
+    def poll_network(self):
+        """Follow the network going up or down with the listeners."""
+        if self.network_monitor.poll():
+            if not self.listening:
+                self.update_hosts()
+                self.listen()
+        else:
+            self.unlisten()
+
+    def start(self):
+        """Start listening for incoming connections."""
+        self.running = True
+        if self.network_monitor is None:
+            self.listen()
+        else:
+            self.poll_network()
+
         try:
-            while self.server.IsRunning:
+            while self.running:
                 sleep(1)
+                if self.network_monitor is not None:
+                    self.poll_network()
+                if self.property_store is not None:
+                    try:
+                        self.property_store.poll()
+                    except OSError as err:
+                        log.error("Saving property values failed: %s", str(err))
+                # Rebase the clock even when nothing takes timestamps, well
+                # before ticks_diff() wraps
+                timestamp()
+                if not self.listening:
+                    continue
+                # Pick up a new DHCP lease without costing requests anything
+                self.update_hosts()
+                self.connections.prune()
+                if gc.mem_free() < self.min_free_memory:
+                    log.info("Low memory, closing idle connections")
+                    self.connections.reap()
+                    gc.collect()
         except KeyboardInterrupt:
             pass
 
     def stop(self):
         """Stop listening."""
-        self.server.Stop()
+        self.running = False
+        self.unlisten()
+        if self.property_store is not None:
+            self.property_store.flush()
+
+    def thingRoutes(self, prefix):
+        """
+        Get the routes served for a thing.
+
+        prefix -- path prefix of the thing's routes
+
+        Returns a list of (path, method, handler) tuples.
+        """
+        return [
+            (prefix or "/", "GET", self.thingGetHandler),
+            (prefix + "/properties", "GET", self.propertiesGetHandler),
+            (prefix + "/properties/<property_name>", "GET", self.propertyGetHandler),
+            (prefix + "/properties/<property_name>", "PUT", self.propertyPutHandler),
+            (
+                prefix + "/properties/<property_name>/history",
+                "GET",
+                self.propertyHistoryGetHandler,
+            ),
+            (
+                prefix + "/properties/<property_name>/rollup",
+                "GET",
+                self.propertyRollupGetHandler,
+            ),
+            (prefix + "/actions", "GET", self.actionsGetHandler),
+            (prefix + "/actions", "POST", self.actionsPostHandler),
+            (prefix + "/actions/<action_name>", "GET", self.actionsGetHandler),
+            (prefix + "/actions/<action_name>", "POST", self.actionsPostHandler),
+            (
+                prefix + "/actions/<action_name>/<action_id>",
+                "GET",
+                self.actionIDGetHandler,
+            ),
+            (
+                prefix + "/actions/<action_name>/<action_id>",
+                "DELETE",
+                self.actionIDDeleteHandler,
+            ),
+            (prefix + "/events", "GET", self.eventsGetHandler),
+            (prefix + "/events/<event_name>", "GET", self.eventsGetHandler),
+        ]
+
+    def dispatch(self, microWebSrv2, request, _=None):
+        """Route a request to its handler."""
+        self.applyCORS(request)
+
+        if not self.keep_alive:
+            request.Response.SetHeader("Connection", "close")
+
+        if not self.connections.admit(request.XAsyncTCPClient):
+            request.Response.SetHeader("Retry-After", "1")
+            self.send_error(request, "dispatch", 503, "Too many connections")
+            return
+
+        if not self.validateHost(request):
+            self.send_error(request, "dispatch", 403, "Invalid Host header")
+            return
+
+        if (
+            self.websockets is None
+            and request.GetHeader("upgrade").lower() == "websocket"
+        ):
+            # Once loaded, the module picks up upgrade requests before they
+            # are routed; hand it this first one
+            self.loadWebSockets().OnRequest(microWebSrv2, request)
+            return
+
+        method = request.Method
+        if method == "OPTIONS":
+            self.optionsHandler(microWebSrv2, request)
+            return
+
+        try:
+            handler, args = self.router.resolve(method, request.Path)
+        except HTTPError as err:
+            self.send_error(request, "dispatch", err.status, err.message)
+            return
+
+        if args is None:
+            handler(microWebSrv2, request)
+        else:
+            handler(microWebSrv2, request, args)
+
+    def loadWebSockets(self):
+        """
+        Load MicroWebSrv2's WebSockets module.
+
+        Returns the module instance.
+        """
+        log.info("Loading the WebSockets module")
+        wsMod = self.server.LoadModule("WebSockets")
+        wsMod.OnWebSocketProtocol = self._OnWebSocketProtocolCallback
+        wsMod.OnWebSocketAccepted = self._OnWebSocketAcceptedCallback
+        self.websockets = wsMod
+        return wsMod
+
+    def applyCORS(self, request):
+        """
+        Add the Access-Control-Allow-Origin header to a response.
+
+        request -- the request being responded to
+
+        Returns True if the request's origin is allowed.
+        """
+        response = request.Response
+        if self.cors_origins is None:
+            response.SetHeader("Access-Control-Allow-Origin", "*")
+            return True
+
+        # The response depends on the origin whether it is allowed or not
+        response.SetHeader("Vary", "Origin")
+        origin = request.GetHeader("origin")
+        if origin not in self.cors_origins:
+            return False
+
+        response.SetHeader("Access-Control-Allow-Origin", origin)
+        return True
+
+    def getThing(self, routeArgs):
+        """Get the thing this request is for, based on the route."""
+        if routeArgs is None:
+            return self.things.get_thing()
+        return self.things.get_thing(routeArgs.get("thing_id"))
+
+    def getAction(self, routeArgs):
+        """Get the thing and action object based on the route."""
+        thing = self.getThing(routeArgs)
+        if thing:
+            action_obj = thing.get_action(
+                routeArgs["action_name"], routeArgs["action_id"]
+            )
+            if action_obj is not None:
+                return thing, action_obj
+        return None, None
 
     def getProperty(self, routeArgs):
         """Get the property name based on the route."""
-        thing = self.thing
+        thing = self.getThing(routeArgs)
         if thing:
             property_name = routeArgs["property_name"]
             if thing.has_property(property_name):
                 return thing, thing.find_property(property_name)
         return None, None
 
-    def getHeader(self, headers, key, default=None):
-        standardized = {k.lower(): v for k, v in headers.items()}
-        return standardized.get(key, default)
+    def describeThing(self, thing, host):
+        """
+        Get the full description of a thing as served to a client.
+
+        thing -- the thing to describe
+        host -- the Host header of the request
+
+        Returns the description as a dictionary.
+        """
+        base_href = "http{}://{}".format(self.ssl_suffix, host)
+        ws_href = "ws{}://{}".format(self.ssl_suffix, host)
+
+        description = thing.as_thing_description()
+        description["links"].append(
+            {"rel": "alternate", "href": "{}{}".format(ws_href, thing.get_href()),}
+        )
+        description["base"] = "{}{}".format(base_href, thing.get_href())
+        description["securityDefinitions"] = {
+            "nosec_sc": {"scheme": "nosec",},
+        }
+        description["security"] = "nosec_sc"
+        return description
+
+    def update_hosts(self, addresses=None):
+        """
+        Rebuild the set of allowed Host headers if the addresses changed.
+
+        addresses -- the current IP addresses, defaults to get_addresses()
+
+        Returns True if the set was rebuilt.
+        """
+        if addresses is None:
+            addresses = get_addresses()
+        addresses = tuple(addresses)
+        if addresses == self.addresses:
+            return False
+
+        hosts = set(self.static_hosts)
+        for address in addresses:
+            hosts.add(address)
+            hosts.add("{}:{}".format(address, self.port))
+
+        # Swap in the new set in one go, requests may be validated concurrently
+        self.hosts = hosts
+        self.addresses = addresses
+        log.info("Allowed hosts updated for %s", addresses)
+        return True
 
-    def validateHost(self, headers):
+    def validateHost(self, request):
         """Validate the Host header in the request."""
-        host = httpRequest.GetHeader(headers, "host")
-        if host is not None and host.lower() in self.hosts:
+        # MicroWebSrv2 stores header names lower-cased already
+        host = request.GetHeader("host")
+        if host and host.lower() in self.hosts:
             return True
 
         return False
 
-    @print_exc
+    def send_error(self, request, route, status, message=None):
+        """
+        Send a small JSON error response and count it against the route.
+
+        request -- the request to respond to
+        route -- name of the route the error occurred on
+        status -- HTTP status code
+        message -- optional reason, truncated to a bounded length
+        """
+        self.error_counts[route] = self.error_counts.get(route, 0) + 1
+
+        if message is None:
+            message = _STATUS_MESSAGES.get(status, "Error")
+
+        response = request.Response
+        if status >= 500:
+            # Don't keep a connection alive after a server-side failure
+            response.SetHeader("Connection", "close")
+
+        try:
+            response.ReturnJSON(status, {"error": message[:_MAX_ERROR_MESSAGE]})
+        except Exception as err:
+            # The handler had already started responding; nothing more to send
+            log.warning("Could not send error response: %r", err)
+
+    def get_connection_metrics(self):
+        """
+        Get connection statistics, including the keep-alive reuse ratio.
+
+        Returns a dictionary of counters.
+        """
+        return self.connections.get_metrics()
+
+    def get_error_counts(self):
+        """
+        Get the number of error responses sent, per route.
+
+        Returns a dictionary of handler name -> count.
+        """
+        return self.error_counts
+
+    @handle_errors
     def optionsHandler(self, microWebSrv2, request):
         """Handle an OPTIONS request to any path."""
-        request.Response.Return(204)
+        response = request.Response
+        for name, value in self.cors_preflight_headers:
+            response.SetHeader(name, value)
+        response.Return(204)
 
-    @print_exc
-    def thingGetHandler(self, microWebSrv2, request):
-        """Handle a GET request for an individual thing."""
+    def sendValue(self, request, value, status=200):
+        """
+        Send a value as CBOR if the client accepts it, else as JSON.
 
-        thing = self.thing
-        if thing is None:
-            request.Response.ReturnNotFound()
+        request -- the request to respond to
+        value -- the value to send
+        status -- HTTP status code
+        """
+        response = request.Response
+        if accepts(request.GetHeader("accept"), _CBOR_MEDIA_TYPE):
+            import cbor
+
+            response.ContentType = cbor.MEDIA_TYPE
+            response.Return(status, cbor.dumps(value))
+        else:
+            response.ReturnJSON(status, value)
+
+    def sendBulk(self, request, prop):
+        """
+        Send the buffer of a bulk property.
+
+        The raw buffer is sent unless the client asks for JSON or CBOR, in
+        which case it is sent as a list of numbers.
+
+        request -- the request to respond to
+        prop -- the bulk property
+        """
+        value = prop.get_value()
+        accept = request.GetHeader("accept")
+        if accepts(accept, _CBOR_MEDIA_TYPE):
+            self.sendValue(request, list(value))
+        elif accepts(accept, "application/json"):
+            self.sendStream(request, iter_json(value), "application/json")
+        else:
+            view = byte_view(value, prop.nbytes)
+            self.sendStream(request, iter_buffer(view), BULK_MEDIA_TYPE)
+
+    def sendStream(self, request, chunks, content_type):
+        """
+        Send a response body as it is generated, with chunked encoding.
+
+        request -- the request to respond to
+        chunks -- iterable of str, bytes or memoryview chunks of the body
+        content_type -- media type of the body
+        """
+        response = request.Response
+        response.ContentType = content_type
+        response.ReturnStream(200, GeneratorStream(chunks))
+
+    def getMaxContentLength(self):
+        """Get the largest request body any route accepts."""
+        size = self.max_body_size
+        for thing in self.things.get_things():
+            for prop in thing.properties.values():
+                if prop.is_bulk:
+                    size = max(size, prop.nbytes)
+        return size
+
+    def checkContentLength(self, request, limit):
+        """
+        Reject a request whose body is larger than a limit, before reading it.
+
+        request -- the request to check
+        limit -- largest body size allowed, in bytes
+        """
+        if request.ContentLength > limit:
+            raise HTTPError(413, "Body larger than {} bytes".format(limit))
+
+    def readValue(self, request):
+        """
+        Decode the body of a request, as CBOR or JSON depending on its type.
+
+        The body is decoded straight from the received content, without
+        copying it to a string first.
+
+        request -- the request to read
+
+        Returns the decoded value, or None if the body is not valid.
+        """
+        self.checkContentLength(request, self.max_body_size)
+
+        content = request.Content
+        if not content:
+            return None
+
+        try:
+            content_type = request.GetHeader("content-type").split(";")[0]
+            if content_type.strip().lower() == _CBOR_MEDIA_TYPE:
+                import cbor
+
+                return cbor.loads(content)
+            return json.loads(content)
+        except (ValueError, IndexError):
+            return None
+
+    def sendCached(self, request, key, revision, build, stream=False):
+        """
+        Send a JSON response from the response cache.
+
+        request -- the request to respond to
+        key -- identifies the response in the cache
+        revision -- version of the data the response is built from
+        build -- callable returning the object to send, called only if the
+                 cached response is missing or out of date
+        stream -- whether to stream the response instead, when the client
+                  doesn't accept a compressed one. Use for documents that
+                  can grow without bound.
+        """
+        encoding = None
+        accept_encoding = request.GetHeader("accept-encoding")
+        if accept_encoding:
+            # Loaded, and deflate probed, only for clients asking for it
+            from compression import negotiate
+
+            encoding = negotiate(accept_encoding)
+        if stream and encoding is None:
+            self.sendStream(request, iter_json(build()), "application/json")
             return
 
-        base_href = "http{}://{}".format(self.ssl_suffix, request.GetHeader("host"))
-        ws_href = "ws{}://{}".format(self.ssl_suffix, request.GetHeader("host"))
+        body, encoding = self.response_cache.get(key, revision, build, encoding)
 
-        description = thing.as_thing_description()
-        description["links"].append(
-            {"rel": "alternate", "href": "{}{}".format(ws_href, thing.get_href()),}
+        response = request.Response
+        response.ContentType = "application/json"
+        # Keep the Vary: Origin set by applyCORS()
+        if self.cors_origins is None:
+            response.SetHeader("Vary", "Accept-Encoding")
+        else:
+            response.SetHeader("Vary", "Origin, Accept-Encoding")
+        if encoding is not None:
+            response.SetHeader("Content-Encoding", encoding)
+        response.Return(200, body)
+
+    @handle_errors
+    def thingsGetHandler(self, microWebSrv2, request):
+        """Handle a GET request for the list of all things."""
+        host = request.GetHeader("host")
+        things = self.things.get_things()
+
+        # The listing only changes when a thing is restructured
+        self.sendCached(
+            request,
+            ("things", host),
+            tuple(thing.revision for thing in things),
+            lambda: [self.describeThing(thing, host) for thing in things],
         )
-        description["base"] = "{}{}".format(base_href, thing.get_href())
-        description["securityDefinitions"] = {
-            "nosec_sc": {"scheme": "nosec",},
-        }
-        description["security"] = "nosec_sc"
-        request.Response.ReturnOkJSON(description)
 
-    @print_exc
-    def propertiesGetHandler(self, microWebSrv2, request):
+    @handle_errors
+    def thingGetHandler(self, microWebSrv2, request, routeArgs=None):
+        """Handle a GET request for an individual thing."""
+        thing = self.getThing(routeArgs)
+        if thing is None:
+            raise HTTPError(404, "Thing not found")
+
+        host = request.GetHeader("host")
+        self.sendCached(
+            request,
+            ("thing", id(thing), host),
+            thing.revision,
+            lambda: self.describeThing(thing, host),
+        )
+
+    @handle_errors
+    def propertiesGetHandler(self, microWebSrv2, request, routeArgs=None):
         """Handle a GET request for a property."""
-        thing = self.thing
+        thing = self.getThing(routeArgs)
         if thing is None:
-            request.Response.ReturnNotFound()
-            return
-        request.Response.ReturnOkJSON(thing.get_properties())
+            raise HTTPError(404, "Thing not found")
+        self.sendValue(request, thing.get_properties())
 
-    @print_exc
+    @handle_errors
     def propertyGetHandler(self, microWebSrv2, request, routeArgs):
         """Handle a GET request for a property."""
         thing, prop = self.getProperty(routeArgs)
         if thing is None:
-            request.Response.ReturnNotFound()
+            raise HTTPError(404, "Property not found")
+
+        if prop.is_bulk:
+            self.sendBulk(request, prop)
             return
 
-        request.Response.ReturnOkJSON(prop.get_value())
+        self.sendValue(request, prop.get_value())
 
-    @print_exc
+    @handle_errors
     def propertyPutHandler(self, microWebSrv2, request, routeArgs):
         """Handle a PUT request for a property."""
         thing, prop = self.getProperty(routeArgs)
         if thing is None:
-            request.Response.ReturnNotFound()
-            return
+            raise HTTPError(404, "Property not found")
 
-        args = request.GetPostedJSONObject()
-        content = request.Content
-        print(content)
+        if prop.is_bulk and request.GetHeader("content-type").startswith(
+            BULK_MEDIA_TYPE
+        ):
+            self.checkContentLength(request, prop.nbytes)
+            args = request.Content
+        else:
+            args = self.readValue(request)
         if args is None:
-            request.Response.ReturnBadRequest()
-            return
+            raise HTTPError(400, "Invalid JSON body")
+        prop.set_value(args)
+
+        if prop.is_bulk:
+            self.sendBulk(request, prop)
+        else:
+            self.sendValue(request, prop.get_value())
+
+    @handle_errors
+    def propertyHistoryGetHandler(self, microWebSrv2, request, routeArgs):
+        """Handle a GET request for the recent values of a property."""
+        thing, prop = self.getProperty(routeArgs)
+        if thing is None:
+            raise HTTPError(404, "Property not found")
+
+        params = request.QueryParams
         try:
-            prop.set_value(args)
-        except PropertyError:
-            request.Response.ReturnBadRequest()
-            return
+            since = int(params["since"]) if "since" in params else None
+            limit = int(params["limit"]) if "limit" in params else None
+        except ValueError:
+            raise HTTPError(400, "since and limit must be integers")
+
+        items = prop.get_history(since, limit)
+        if items is None:
+            raise HTTPError(404, "Property has no history")
+
+        # Ticks are only meaningful relative to the device's current ticks
+        self.sendValue(request, {"now": ticks_ms(), "items": items})
+
+    @handle_errors
+    def propertyRollupGetHandler(self, microWebSrv2, request, routeArgs):
+        """Handle a GET request for aggregates of a property's recent values."""
+        thing, prop = self.getProperty(routeArgs)
+        if thing is None:
+            raise HTTPError(404, "Property not found")
+
+        params = request.QueryParams
+        try:
+            span = int(params["span"])
+            points = int(params.get("points", 100))
+        except (KeyError, ValueError):
+            raise HTTPError(400, "span and points must be integers")
+        if span <= 0 or points <= 0:
+            raise HTTPError(400, "span and points must be positive")
+
+        rollup = prop.get_rollup(span, points)
+        if rollup is None:
+            raise HTTPError(404, "Property has no rollup")
 
-        request.Response.ReturnOkJSON(prop.get_value())
+        resolution, items = rollup
+        self.sendValue(
+            request, {"now": ticks_ms(), "resolution": resolution, "items": items}
+        )
+
+    @handle_errors
+    def logsGetHandler(self, microWebSrv2, request):
+        """Handle a GET request for the recent log records."""
+        if logging.ring is None:
+            raise HTTPError(404, "Log ring buffer not enabled")
+
+        # Records are only formatted now, as they are sent
+        self.sendStream(
+            request, iter_json(logging.ring.get_lines()), "application/json"
+        )
+
+    @handle_errors
+    def actionsGetHandler(self, microWebSrv2, request, routeArgs=None):
+        """Handle a GET request for a list of action objects."""
+        thing = self.getThing(routeArgs)
+        if thing is None:
+            raise HTTPError(404, "Thing not found")
+
+        action_name = routeArgs.get("action_name") if routeArgs else None
+        self.sendCached(
+            request,
+            ("actions", id(thing), action_name),
+            thing.action_revision,
+            lambda: thing.get_action_descriptions(action_name),
+            stream=True,
+        )
+
+    @handle_errors
+    def actionsPostHandler(self, microWebSrv2, request, routeArgs=None):
+        """Handle a POST request to invoke an action."""
+        thing = self.getThing(routeArgs)
+        if thing is None:
+            raise HTTPError(404, "Thing not found")
+
+        message = self.readValue(request)
+        if not isinstance(message, dict) or len(message) != 1:
+            raise HTTPError(400, "Invalid action request")
+
+        action_name, action_params = list(message.items())[0]
+        if routeArgs and routeArgs.get("action_name", action_name) != action_name:
+            raise HTTPError(400, "Action name does not match route")
+
+        input_ = None
+        if isinstance(action_params, dict):
+            input_ = action_params.get("input", None)
+
+        action_obj = thing.invokeaction(action_name, input_=input_)
+        if action_obj is None:
+            raise HTTPError(404, "Action not found")
+
+        self.sendValue(request, action_obj.as_action_description(), 201)
+
+    @handle_errors
+    def actionIDGetHandler(self, microWebSrv2, request, routeArgs):
+        """Handle a GET request for an individual action object."""
+        thing, action_obj = self.getAction(routeArgs)
+        if thing is None:
+            raise HTTPError(404, "Action not found")
+
+        self.sendValue(request, action_obj.as_action_description())
+
+    @handle_errors
+    def actionIDDeleteHandler(self, microWebSrv2, request, routeArgs):
+        """Handle a DELETE request to cancel an action object."""
+        thing = self.getThing(routeArgs)
+        if thing is None or not thing.remove_action(
+            routeArgs["action_name"], routeArgs["action_id"]
+        ):
+            raise HTTPError(404, "Action not found")
+
+        request.Response.Return(204)
+
+    @handle_errors
+    def eventsGetHandler(self, microWebSrv2, request, routeArgs=None):
+        """Handle a GET request for a list of events."""
+        thing = self.getThing(routeArgs)
+        if thing is None:
+            raise HTTPError(404, "Thing not found")
+
+        event_name = routeArgs.get("event_name") if routeArgs else None
+        self.sendCached(
+            request,
+            ("events", id(thing), event_name),
+            thing.event_revision,
+            lambda: thing.get_event_descriptions(event_name),
+            stream=True,
+        )
 
     # === MicroWebSocket callbacks ===
 
+    @print_exc
+    def _OnWebSocketProtocolCallback(self, microWebSrv2, protocols):
+        if _WS_CBOR_PROTOCOL in protocols:
+            return _WS_CBOR_PROTOCOL
+        return None
+
     @print_exc
     def _OnWebSocketAcceptedCallback(self, microWebSrv2, webSocket):
         if WS_messages:
@@ -255,22 +1029,49 @@ class WebThingServer:
         webSocket.OnTextMessage = self._OnTextMessageCallback
         webSocket.OnBinaryMessage = self._OnBinaryMessageCallback
         webSocket.OnClosed = self._OnClosedCallback
-        webSocket.thing = self.thing
-        self.thing.add_subscriber(webSocket)
+
+        # Upgrades after the first one are handled by the WebSockets module
+        # before dispatch(), so the Host header is checked here as well
+        if not self.validateHost(webSocket.Request):
+            log.info("Closing WebSocket with invalid Host header")
+            self.error_counts["websocket"] = self.error_counts.get("websocket", 0) + 1
+            webSocket.Close()
+            return
+
+        # Subscribe the socket only to the thing it was opened on, so that
+        # notifications are only sent to interested clients
+        segments = webSocket.Request.Path.strip("/").split("/")
+        thing = self.things.get_thing(segments[0])
+        if thing is None:
+            webSocket.Close()
+            return
+
+        webSocket.thing = thing
+        # Send binary CBOR frames only if that subprotocol was negotiated,
+        # making the same choice from the offered ones as the protocol
+        # callback did during the handshake
+        offered = webSocket.Request.GetHeader("sec-websocket-protocol")
+        protocols = [protocol.strip() for protocol in offered.split(",")]
+        webSocket.cbor = (
+            self._OnWebSocketProtocolCallback(microWebSrv2, protocols)
+            == _WS_CBOR_PROTOCOL
+        )
+        thing.add_subscriber(webSocket)
 
     @print_exc
     def _OnTextMessageCallback(self, webSocket, msg):
-        if WS_messages:
-            print("WS RECV TEXT : %s" % msg)
+        log.debug("WS RECV TEXT : %s", msg)
 
     @print_exc
     def _OnBinaryMessageCallback(self, webSocket, data):
-        if WS_messages:
-            print("WS RECV DATA : %s" % data)
+        log.debug("WS RECV DATA : %s", data)
 
     @print_exc
     def _OnClosedCallback(self, webSocket):
+        thing = getattr(webSocket, "thing", None)
+        if thing is not None:
+            thing.remove_subscriber(webSocket)
         if WS_messages:
             if ws_run_in_thread or srv_run_in_thread:
                 _thread.list()
-            print("WS CLOSED")
+        log.debug("WS CLOSED")
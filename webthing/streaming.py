@@ -0,0 +1,159 @@
+"""Streaming of large response bodies."""
+
+import array
+import json
+
+# Size of the buffer a stream copies its chunks into
+_CHUNK_SIZE = 512
+
+
+def iter_json(obj):
+    """
+    Encode an object as JSON incrementally.
+
+    Dicts, lists, tuples and arrays are walked rather than serialized in one
+    go, so that the whole document never has to be held in memory.
+
+    obj -- the object to encode
+
+    Yields pieces of the JSON text.
+    """
+    t = type(obj)
+    if t is dict:
+        yield "{"
+        first = True
+        for key, value in obj.items():
+            if not first:
+                yield ","
+            first = False
+            yield json.dumps(str(key))
+            yield ":"
+            yield from iter_json(value)
+        yield "}"
+    elif t is list or t is tuple or t is array.array:
+        yield "["
+        first = True
+        for value in obj:
+            if not first:
+                yield ","
+            first = False
+            yield from iter_json(value)
+        yield "]"
+    else:
+        yield json.dumps(obj)
+
+
+def byte_view(buffer, nbytes):
+    """
+    Get a memoryview of the raw bytes of a buffer, i.e. an array.array.
+
+    buffer -- the buffer
+    nbytes -- its size in bytes
+
+    Returns a memoryview indexed by byte.
+    """
+    view = memoryview(buffer)
+    try:
+        # CPython
+        return view.cast("B")
+    except AttributeError:
+        pass
+
+    try:
+        import uctypes
+    except ImportError:
+        return view
+
+    return memoryview(uctypes.bytearray_at(uctypes.addressof(buffer), nbytes))
+
+
+def iter_buffer(view, size=_CHUNK_SIZE):
+    """
+    Slice a buffer into chunks without copying it.
+
+    view -- memoryview of the buffer, as returned by byte_view()
+    size -- chunk size in bytes
+
+    Yields memoryview slices of the buffer.
+    """
+    for offset in range(0, len(view), size):
+        yield view[offset : offset + size]
+
+
+class GeneratorStream:
+    """
+    A readable stream over the chunks yielded by a generator.
+
+    Used with MicroWebSrv2's ReturnStream, which sends the body with chunked
+    transfer encoding as it is read. Chunks may be str, bytes or memoryviews,
+    and are copied into the reader's buffer, or into one buffer allocated per
+    stream and reused for every read.
+    """
+
+    def __init__(self, chunks, size=_CHUNK_SIZE):
+        """
+        Initialize the object.
+
+        chunks -- iterable of chunks
+        size -- size of the stream's own buffer
+        """
+        self.chunks = iter(chunks)
+        self.piece = None
+        self.offset = 0
+        self.buffer = None
+        self.size = size
+
+    def readinto(self, buf):
+        """
+        Fill a buffer with the next bytes of the stream.
+
+        buf -- writable buffer
+
+        Returns the number of bytes written, 0 at the end of the stream.
+        """
+        n = 0
+        size = len(buf)
+
+        while n < size:
+            if self.piece is None:
+                try:
+                    piece = next(self.chunks)
+                except StopIteration:
+                    break
+                if type(piece) is str:
+                    piece = piece.encode()
+                self.piece = memoryview(piece)
+                self.offset = 0
+
+            count = min(size - n, len(self.piece) - self.offset)
+            buf[n : n + count] = self.piece[self.offset : self.offset + count]
+            n += count
+            self.offset += count
+
+            if self.offset >= len(self.piece):
+                self.piece = None
+
+        return n
+
+    def read(self, size=-1):
+        """
+        Read the next bytes of the stream.
+
+        The returned view is only valid until the next call.
+
+        size -- maximum number of bytes, defaults to the stream's buffer size
+
+        Returns a memoryview of up to size bytes, empty at the end.
+        """
+        if self.buffer is None:
+            self.buffer = bytearray(self.size)
+        if size < 0 or size > self.size:
+            size = self.size
+
+        view = memoryview(self.buffer)
+        return view[: self.readinto(view[:size])]
+
+    def close(self):
+        """Stop the stream, releasing its generator."""
+        self.chunks = iter(())
+        self.piece = None
@@ -2,6 +2,12 @@
 
 import json
 
+from streaming import byte_view
+from upy import logging
+from utils import make_description
+
+log = logging.getLogger(__name__)
+
 
 class Thing:
     """A Web Thing."""
@@ -34,6 +40,17 @@ class Thing:
         self.href_prefix = ""
         self.ui_href = None
 
+        # Bumped whenever the thing description changes shape, so that cached
+        # descriptions can be invalidated
+        self.revision = 0
+        # Bumped whenever an action's status changes or an event occurs
+        self.action_revision = 0
+        self.event_revision = 0
+
+        # One handler subscribed to the values of all properties, bound once
+        # here as every attribute access would make a new bound method
+        self.value_handler = self.on_value_update
+
     def as_thing_description(self):
         """
         Return the thing state as a Thing Description.
@@ -59,22 +76,10 @@ class Thing:
         }
 
         for name, action in self.actions.items():
-            thing["actions"][name] = action.metadata
-            thing["actions"][name]["links"] = [
-                {
-                    "rel": "action",
-                    "href": "{}/actions/{}".format(self.href_prefix, name),
-                },
-            ]
+            thing["actions"][name] = action.get_description()
 
         for name, event in self.available_events.items():
-            thing["events"][name] = event["metadata"]
-            thing["events"][name]["links"] = [
-                {
-                    "rel": "event",
-                    "href": "{}/events/{}".format(self.href_prefix, name),
-                },
-            ]
+            thing["events"][name] = event["description"]
 
         if self.ui_href is not None:
             thing["links"].append(
@@ -104,13 +109,16 @@ class Thing:
         prefix -- the prefix
         """
         self.href_prefix = prefix
+        self.revision += 1
 
         for property_ in self.properties.values():
             property_.set_href_prefix(prefix)
 
-        for action_name in self.actions.keys():
-            for action_obj in self.actions[action_name].queue:
-                action_obj.set_href_prefix(prefix)
+        for action in self.actions.values():
+            action.set_href_prefix(prefix)
+
+        for name, event in self.available_events.items():
+            event["description"] = self.describe_event(name, event["metadata"])
 
     def set_ui_href(self, href):
         """
@@ -119,6 +127,7 @@ class Thing:
         href -- the href
         """
         self.ui_href = href
+        self.revision += 1
 
     def get_id(self):
         """
@@ -179,7 +188,7 @@ class Thing:
         descriptions = []
 
         if action_name is None:
-            for action in self.actions:
+            for action in self.actions.values():
                 for action_obj in action.queue:
                     descriptions.append(action_obj.as_action_description())
         elif action_name in self.actions:
@@ -212,7 +221,9 @@ class Thing:
         property_ -- property to add
         """
         property_.set_href_prefix(self.href_prefix)
+        property_.value.on("update", self.value_handler)
         self.properties[property_.name] = property_
+        self.revision += 1
 
     def remove_property(self, property_):
         """
@@ -222,6 +233,8 @@ class Thing:
         """
         if property_.name in self.properties:
             del self.properties[property_.name]
+            property_.value.off("update", self.value_handler)
+            self.revision += 1
 
     def find_property(self, property_name):
         """
@@ -251,9 +264,15 @@ class Thing:
         """
         Get a mapping of all properties and their values.
 
+        Bulk properties are left out, their buffers are fetched individually.
+
         Returns a dictionary of property_name -> value.
         """
-        return {prop.get_name(): prop.get_value() for prop in self.properties.values()}
+        return {
+            prop.get_name(): prop.get_value()
+            for prop in self.properties.values()
+            if not prop.is_bulk
+        }
 
     def has_property(self, property_name):
         """
@@ -291,11 +310,25 @@ class Thing:
         if action_name not in self.actions:
             return None
 
-        for action_obj in self.actions[action_name].queue:
-            if action_obj.id == action_id:
-                return action_obj
+        return self.actions[action_name].get(action_id)
 
-        return None
+    def shift_timestamps(self, correction):
+        """
+        Correct the timestamps of past actions and events after a clock change.
+
+        correction -- milliseconds to add, as returned by utils.sync_clock()
+        """
+        for action in self.actions.values():
+            for action_obj in action.queue:
+                action_obj.time_requested += correction
+                if action_obj.time_completed is not None:
+                    action_obj.time_completed += correction
+
+        for event in self.events:
+            event.time += correction
+
+        self.action_revision += 1
+        self.event_revision += 1
 
     def add_event(self, event):
         """
@@ -304,22 +337,44 @@ class Thing:
         event -- the event that occurred
         """
         self.events.append(event)
+        self.event_revision += 1
         self.event_notify(event)
 
-    def add_available_event(self, name, metadata):
+    def describe_event(self, name, metadata):
+        """
+        Build the description of an available event.
+
+        name -- name of the event
+        metadata -- event metadata
+
+        Returns the description as a dictionary.
+        """
+        return make_description(
+            metadata,
+            [{"rel": "event", "href": "{}/events/{}".format(self.href_prefix, name)}],
+        )
+
+    def add_available_event(self, name, metadata, description=None):
         """
         Add an available event.
 
         name -- name of the event
         metadata -- event metadata, i.e. type, description, etc., as a dict
+        description -- the description, prebuilt for an empty href prefix,
+                       see definition.py
         """
         if metadata is None:
             metadata = {}
 
+        if description is None or self.href_prefix:
+            description = self.describe_event(name, metadata)
+
         self.available_events[name] = {
             "metadata": metadata,
+            "description": description,
             "subscribers": set(),
         }
+        self.revision += 1
 
     def invokeaction(self, action_name, input_=None):
         """
@@ -361,6 +416,8 @@ class Thing:
             return False
 
         action_obj.cancel()
+        self.actions[action_name].remove(action_obj)
+        self.action_revision += 1
         return True
 
     def add_action(self, action):
@@ -370,7 +427,9 @@ class Thing:
         action -- Action instance
         """
 
+        action.set_href_prefix(self.href_prefix)
         self.actions[action.name] = action
+        self.revision += 1
 
     def add_subscriber(self, ws):
         """
@@ -399,7 +458,7 @@ class Thing:
         name -- name of the event
         ws -- the websocket
         """
-        print("add_event_subscriber:", name)
+        log.debug("add_event_subscriber: %s", name)
         if name in self.available_events:
             self.available_events[name]["subscribers"].add(ws)
 
@@ -410,28 +469,89 @@ class Thing:
         name -- name of the event
         ws -- the websocket
         """
-        print("remove_event_subscriber:", name)
+        log.debug("remove_event_subscriber: %s", name)
         if (
             name in self.available_events
             and ws in self.available_events[name]["subscribers"]
         ):
             self.available_events[name]["subscribers"].remove(ws)
 
+    def broadcast(self, subscribers, message):
+        """
+        Send a message to a set of websocket subscribers.
+
+        The message is encoded at most once per format: as CBOR in a binary
+        frame for subscribers that negotiated it, as JSON text otherwise.
+
+        subscribers -- the websockets to send to
+        message -- the message, as a dict
+        """
+        text = None
+        binary = None
+
+        for subscriber in subscribers:
+            if getattr(subscriber, "cbor", False):
+                if binary is None:
+                    # Only loaded once a subscriber negotiated CBOR
+                    import cbor
+
+                    binary = cbor.dumps(message)
+                subscriber.SendBinary(binary)
+            else:
+                if text is None:
+                    text = json.dumps(message)
+                subscriber.SendText(text)
+
+    def on_value_update(self, value):
+        """
+        Handle an update of the value of one of this thing's properties.
+
+        value -- the Value that was updated
+        """
+        self.property_notify(value.owner)
+
     def property_notify(self, property_):
         """
         Notify all subscribers of a property change.
 
         property_ -- the property that changed
         """
-        message = json.dumps(
+        if property_.is_bulk:
+            self.bulk_property_notify(property_)
+            return
+
+        self.broadcast(
+            self.subscribers,
             {
                 "messageType": "propertyStatus",
                 "data": {property_.name: property_.get_value(),},
-            }
+            },
         )
 
+    def bulk_property_notify(self, property_):
+        """
+        Notify all subscribers of a change of a bulk property.
+
+        Sends a propertyData message describing the buffer, then the buffer
+        itself in a binary frame.
+
+        property_ -- the bulk property that changed
+        """
+        if not self.subscribers:
+            return
+
+        self.broadcast(
+            self.subscribers,
+            {
+                "messageType": "propertyData",
+                "data": {property_.name: property_.get_data_description()},
+            },
+        )
+
+        # A plain memoryview of an array is indexed by item, not by byte
+        data = byte_view(property_.get_value(), property_.nbytes)
         for subscriber in self.subscribers:
-            subscriber.SendText(message)
+            subscriber.SendBinary(data)
 
     def action_notify(self, action_obj):
         """
@@ -439,12 +559,15 @@ class Thing:
 
         action_obj -- the action_obj whose status changed
         """
-        message = json.dumps(
-            {"messageType": "actionStatus", "data": action_obj.as_action_description(),}
-        )
+        self.action_revision += 1
 
-        for subscriber in self.subscribers:
-            subscriber.SendText(message)
+        self.broadcast(
+            self.subscribers,
+            {
+                "messageType": "actionStatus",
+                "data": action_obj.as_action_description(),
+            },
+        )
 
     def event_notify(self, event):
         """
@@ -455,9 +578,7 @@ class Thing:
         if event.name not in self.available_events:
             return
 
-        message = json.dumps(
-            {"messageType": "event", "data": event.as_event_description(),}
+        self.broadcast(
+            self.available_events[event.name]["subscribers"],
+            {"messageType": "event", "data": event.as_event_description(),},
         )
-
-        for subscriber in self.available_events[event.name]["subscribers"]:
-            subscriber.SendText(message)
@@ -159,6 +159,16 @@ def deepcopy(x, memo=None, _nil=[]):
     See the module's __doc__ string for more info.
     """
 
+    cls = type(x)
+
+    # Immutable atoms are their own copy, and never go in the memo
+    copier = _deepcopy_dispatch.get(cls)
+    if copier is _deepcopy_atomic:
+        return x
+
+    # Only a memo passed in by the caller outlives this call, and needs the
+    # originals kept alive
+    keep = memo is not None
     if memo is None:
         memo = {}
 
@@ -167,9 +177,6 @@ def deepcopy(x, memo=None, _nil=[]):
     if y is not _nil:
         return y
 
-    cls = type(x)
-
-    copier = _deepcopy_dispatch.get(cls)
     if copier:
         y = copier(x, memo)
     else:
@@ -202,10 +209,13 @@ def deepcopy(x, memo=None, _nil=[]):
     # If is its own copy, don't memoize.
     if y is not x:
         memo[d] = y
-        _keep_alive(x, memo)  # Make sure x lives at least as long as d
+        if keep:
+            _keep_alive(x, memo)  # Make sure x lives at least as long as d
     return y
 
 
+dispatch_table = {}
+
 _deepcopy_dispatch = d = {}
 
 
@@ -235,18 +245,59 @@ d[types.FunctionType] = _deepcopy_atomic
 # d[weakref.ref] = _deepcopy_atomic
 
 
-def _deepcopy_list(x, memo):
-    y = []
+def _deepcopy_child(x, memo, stack):
+    # Copy a value found inside a list or dict. Nested lists and dicts are
+    # created empty and queued on the stack to be filled, rather than copied
+    # recursively.
+    cls = type(x)
+    if cls is list or cls is dict:
+        d = id(x)
+        y = memo.get(d)
+        if y is None:
+            y = cls()
+            memo[d] = y
+            stack.append((x, y))
+        return y
+    return deepcopy(x, memo)
+
+
+def _deepcopy_tree(x, memo):
+    # Copy nested lists and dicts iteratively, so that deep structures don't
+    # run into MicroPython's recursion limit. Other values inside them still
+    # go through deepcopy().
+    y = type(x)()
     memo[id(x)] = y
-    for a in x:
-        y.append(deepcopy(a, memo))
+    stack = [(x, y)]
+    dispatch = _deepcopy_dispatch
+    atomic = _deepcopy_atomic
+    while stack:
+        src, dst = stack.pop()
+        if type(src) is list:
+            for value in src:
+                if dispatch.get(type(value)) is not atomic:
+                    value = _deepcopy_child(value, memo, stack)
+                dst.append(value)
+        else:
+            for key, value in src.items():
+                if dispatch.get(type(key)) is not atomic:
+                    key = deepcopy(key, memo)
+                if dispatch.get(type(value)) is not atomic:
+                    value = _deepcopy_child(value, memo, stack)
+                dst[key] = value
     return y
 
 
-d[list] = _deepcopy_list
+d[list] = _deepcopy_tree
 
 
 def _deepcopy_tuple(x, memo):
+    # A tuple of atoms is its own copy
+    for a in x:
+        if _deepcopy_dispatch.get(type(a)) is not _deepcopy_atomic:
+            break
+    else:
+        return x
+
     y = []
     for a in x:
         y.append(deepcopy(a, memo))
@@ -266,19 +317,9 @@ def _deepcopy_tuple(x, memo):
 
 
 d[tuple] = _deepcopy_tuple
-
-
-def _deepcopy_dict(x, memo):
-    y = {}
-    memo[id(x)] = y
-    for key, value in x.items():
-        y[deepcopy(key, memo)] = deepcopy(value, memo)
-    return y
-
-
-d[dict] = _deepcopy_dict
+d[dict] = _deepcopy_tree
 if PyStringMap is not None:
-    d[PyStringMap] = _deepcopy_dict
+    d[PyStringMap] = _deepcopy_tree
 
 
 def _deepcopy_method(x, memo):  # Copy instance methods
@@ -4,20 +4,124 @@
 """
 
 
+class _Once:
+    """A handler that removes itself after its first call."""
+
+    __slots__ = ("emitter", "event", "handler")
+
+    def __init__(self, emitter, event, handler):
+        self.emitter = emitter
+        self.event = event
+        self.handler = handler
+
+    def __call__(self, data):
+        # Removed by identity, not to remove an on() registration of the
+        # same handler
+        self.emitter.off(self.event, self)
+        self.handler(data)
+
+
 class EventEmitter:
+    """
+    Calls handlers registered for an event whenever it is emitted.
+
+    An event with one handler stores the handler itself rather than a list,
+    and emitting it calls the handler directly, so the common case allocates
+    nothing.
+    """
+
+    __slots__ = ("_events",)
+
     def __init__(self):
-        self._events = {}
+        # event -> handler, or list of handlers; created on first use
+        self._events = None
 
     def on(self, event, handler):
+        """
+        Register a handler for an event.
+
+        event -- name of the event
+        handler -- callable taking the data emitted with the event
+        """
         events = self._events
-        if event not in events:
-            events[event] = []
-        events[event].append(handler)
+        if events is None:
+            events = self._events = {}
+
+        handlers = events.get(event)
+        if handlers is None:
+            events[event] = handler
+        elif type(handlers) is list:
+            # Replace rather than mutate the list, as emit() may be iterating
+            # over it
+            events[event] = handlers + [handler]
+        else:
+            events[event] = [handlers, handler]
+
+    def once(self, event, handler):
+        """
+        Register a handler to be called for the next emit of an event only.
+
+        event -- name of the event
+        handler -- callable taking the data emitted with the event
+        """
+        self.on(event, _Once(self, event, handler))
 
-    def emit(self, event, *data):
+    def off(self, event, handler=None):
+        """
+        Remove a handler.
+
+        event -- name of the event
+        handler -- the handler as registered with on() or once(), or None to
+                   remove all handlers of the event
+        """
         events = self._events
-        if event not in events:
+        if events is None or event not in events:
+            return
+
+        if handler is None:
+            del events[event]
             return
+
         handlers = events[event]
+        if type(handlers) is not list:
+            if _matches(handlers, handler):
+                del events[event]
+            return
+
+        for idx, registered in enumerate(handlers):
+            if _matches(registered, handler):
+                # Replace rather than mutate the list, as emit() may be
+                # iterating over it
+                handlers = handlers[:idx] + handlers[idx + 1 :]
+                events[event] = handlers[0] if len(handlers) == 1 else handlers
+                return
+
+    def emit(self, event, data=None):
+        """
+        Call the handlers of an event.
+
+        event -- name of the event
+        data -- value passed to each handler
+        """
+        events = self._events
+        if events is None:
+            return
+
+        handlers = events.get(event)
+        if handlers is None:
+            return
+
+        if type(handlers) is not list:
+            handlers(data)
+            return
+
         for handler in handlers:
             handler(data)
+
+
+def _matches(registered, handler):
+    if type(handler) is _Once:
+        return registered is handler
+    return registered == handler or (
+        type(registered) is _Once and registered.handler == handler
+    )
@@ -1,4 +1,6 @@
 import sys
+import time
+import _thread
 
 CRITICAL = 50
 ERROR = 40
@@ -18,22 +20,164 @@ _level_dict = {
 _stream = sys.stderr
 
 
+def _level_str(level):
+    if level in _level_dict:
+        return _level_dict[level]
+    return "LVL" + str(level)
+
+
+def format_record(record):
+    """Format a (ticks, level, name, msg, args) record as a line."""
+    _, level, name, msg, args = record
+    if args:
+        try:
+            msg = msg % args
+        except Exception:
+            # A bad format must not take the writer thread or /logs down
+            msg = "%s (bad log arguments: %r)" % (msg, args)
+    return "%s:%s:%s" % (_level_str(level), name, msg)
+
+
+# Types of log arguments kept as they are in records
+_SMALL_TYPES = (int, float, bool, type(None))
+
+# Longest string argument kept in a record
+_MAX_ARG_LEN = 80
+
+
+class _Text:
+    """An argument replaced by its text, formatted as is by %s and %r."""
+
+    def __init__(self, text):
+        if len(text) > _MAX_ARG_LEN:
+            text = text[:_MAX_ARG_LEN] + "..."
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return self.text
+
+
+def _compact_arg(arg):
+    # Records outlive the call in the ring, so they must not hold on to
+    # buffers or other large, mutable objects
+    t = type(arg)
+    if t in _SMALL_TYPES:
+        return arg
+    if t is str:
+        return arg if len(arg) <= _MAX_ARG_LEN else arg[:_MAX_ARG_LEN] + "..."
+    if t in (bytes, bytearray, memoryview):
+        return _Text("<%s of %d bytes>" % (t.__name__, len(arg)))
+    if isinstance(arg, Exception):
+        return _Text("%s: %s" % (t.__name__, arg))
+    return _Text(repr(arg))
+
+
+class StreamHandler:
+    """Write records to a stream as they are logged."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def emit(self, record):
+        print(format_record(record), file=self.stream or _stream)
+
+
+class RingHandler:
+    """
+    Keep the most recent records in a fixed-size ring in RAM.
+
+    Records are stored unformatted, and only formatted when read.
+    """
+
+    def __init__(self, size=64):
+        self.records = [None] * size
+        self.head = 0
+        self.count = 0
+
+    def emit(self, record):
+        self.records[self.head] = record
+        self.head = (self.head + 1) % len(self.records)
+        if self.count < len(self.records):
+            self.count += 1
+
+    def get_lines(self):
+        """Get the records held, oldest first, as (ticks, line) pairs."""
+        size = len(self.records)
+        start = self.head - self.count
+        return [
+            (record[0], format_record(record))
+            for record in (self.records[(start + i) % size] for i in range(self.count))
+        ]
+
+
+class ThreadedStreamHandler(RingHandler):
+    """
+    Write records to a stream from a background thread.
+
+    Logging only queues the record, so a slow stream (i.e. a serial console)
+    doesn't hold up the caller. If the queue is full the oldest record is
+    dropped.
+    """
+
+    def __init__(self, stream=None, size=32):
+        RingHandler.__init__(self, size)
+        self.stream = stream
+        self.dropped = 0
+        self.lock = _thread.allocate_lock()
+        _thread.start_new_thread(self._run, ())
+
+    def emit(self, record):
+        with self.lock:
+            if self.count == len(self.records):
+                self.dropped += 1
+            RingHandler.emit(self, record)
+
+    def _take(self):
+        with self.lock:
+            if not self.count:
+                return None
+            idx = (self.head - self.count) % len(self.records)
+            record = self.records[idx]
+            self.records[idx] = None
+            self.count -= 1
+            return record
+
+    def _run(self):
+        while True:
+            record = self._take()
+            if record is None:
+                time.sleep_ms(20)
+                continue
+            try:
+                print(format_record(record), file=self.stream or _stream)
+            except Exception:
+                # Keep writing later records whatever happened to this one
+                pass
+
+
 class Logger:
     def __init__(self, name):
         self.level = NOTSET
         self.name = name
 
     def _level_str(self, level):
-        if level in _level_dict:
-            return _level_dict[level]
-        return "LVL" + str(level)
+        return _level_str(level)
+
+    def isEnabledFor(self, level):
+        return level >= (self.level or _level)
 
     def log(self, level, msg, *args):
+        # Formatting is left to the handlers, and skipped entirely for records
+        # that don't pass the level
         if level >= (self.level or _level):
-            print(
-                ("%s:%s:" + msg) % ((self._level_str(level), self.name) + args),
-                file=_stream,
-            )
+            if args:
+                args = tuple(_compact_arg(arg) for arg in args)
+            record = (time.ticks_ms(), level, self.name, msg, args)
+            for handler in _handlers:
+                handler.emit(record)
 
     def debug(self, msg, *args):
         self.log(DEBUG, msg, *args)
@@ -50,9 +194,19 @@ class Logger:
     def critical(self, msg, *args):
         self.log(CRITICAL, msg, *args)
 
+    def exc(self, err, msg, *args):
+        """Log an error, and print the traceback of err at DEBUG level."""
+        self.log(ERROR, msg, *args)
+        if DEBUG >= (self.level or _level):
+            sys.print_exception(err, _stream)
+
 
 _level = INFO
 _loggers = {}
+_handlers = [StreamHandler()]
+
+# RingHandler set up by basicConfig(), if any
+ring = None
 
 
 def getLogger(name):
@@ -71,8 +225,31 @@ def debug(msg, *args):
     getLogger(None).debug(msg, *args)
 
 
-def basicConfig(level=INFO, filename=None, stream=None, format=None):
-    global _level, _stream
+def addHandler(handler):
+    _handlers.append(handler)
+
+
+def removeHandler(handler):
+    if handler in _handlers:
+        _handlers.remove(handler)
+
+
+def basicConfig(
+    level=INFO,
+    filename=None,
+    stream=None,
+    format=None,
+    ring_size=0,
+    threaded=False,
+):
+    """
+    Configure logging.
+
+    ring_size -- if not 0, also keep this many recent records in RAM, readable
+                 from logging.ring
+    threaded -- write to the stream from a background thread
+    """
+    global _level, _stream, _handlers, ring
     _level = level
     if stream:
         _stream = stream
@@ -80,3 +257,9 @@ def basicConfig(level=INFO, filename=None, stream=None, format=None):
         print("logging.basicConfig: filename arg is not supported")
     if format is not None:
         print("logging.basicConfig: format arg is not supported")
+
+    _handlers = [ThreadedStreamHandler() if threaded else StreamHandler()]
+    ring = None
+    if ring_size:
+        ring = RingHandler(ring_size)
+        _handlers.append(ring)
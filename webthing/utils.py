@@ -1,17 +1,146 @@
 """Utility functions."""
 
+import os
 import time
 import network
 
 
+# Wall clock time, in milliseconds since the epoch of time.time(), at which
+# time.ticks_ms() read _base_ticks. Timestamps are taken as an offset from
+# ticks rather than from the RTC, which is much cheaper and has millisecond
+# resolution.
+_base_ms = 0
+_base_ticks = 0
+
+# Rebase on the RTC well before ticks_diff() overflows
+_MAX_OFFSET_MS = 24 * 60 * 60 * 1000
+
+# The last second formatted by format_timestamp(), and its formatted string
+_formatted = (None, None)
+
+
+if hasattr(time, "time_ns"):
+
+    def _rtc_ms():
+        return time.time_ns() // 1000000
+
+
+else:
+
+    def _rtc_ms():
+        # Whole seconds only, on ports where time.time() returns an int
+        return int(time.time() * 1000)
+
+
+def sync_clock():
+    """
+    Re-read the wall clock time from the RTC.
+
+    Call this after the RTC is set, i.e. after an NTP sync.
+
+    Returns the difference to the previous clock, in milliseconds.
+    """
+    global _base_ms, _base_ticks
+    now = time.ticks_ms()
+    # Worked out from the old base directly, as timestamp() may be rebasing
+    previous = _base_ms + time.ticks_diff(now, _base_ticks) if _base_ticks else 0
+    _base_ticks = now
+    _base_ms = _rtc_ms()
+    return _base_ms - previous
+
+
 def timestamp():
     """
     Get the current time.
 
-    Returns the current time in the form YYYY-mm-ddTHH:MM:SS+00:00
+    Returns the time in milliseconds since the epoch of time.time(). Use
+    format_timestamp() to turn it into a string.
+    """
+    offset = time.ticks_diff(time.ticks_ms(), _base_ticks)
+    if offset > _MAX_OFFSET_MS:
+        sync_clock()
+        offset = time.ticks_diff(time.ticks_ms(), _base_ticks)
+    return _base_ms + offset
+
+
+def format_timestamp(ms, precise=False):
+    """
+    Format a time returned by timestamp().
+
+    ms -- the time, in milliseconds
+    precise -- whether to include milliseconds
+
+    Returns the time in the form YYYY-mm-ddTHH:MM:SS+00:00, or
+    YYYY-mm-ddTHH:MM:SS.sss+00:00 if precise.
+    """
+    global _formatted
+    seconds = ms // 1000
+
+    # Bursts of timestamps within the same second share one formatting
+    cached_seconds, formatted = _formatted
+    if cached_seconds != seconds:
+        now = time.localtime(seconds)
+        formatted = "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}".format(*now[:6])
+        _formatted = (seconds, formatted)
+
+    if precise:
+        return "{}.{:03d}+00:00".format(formatted, ms % 1000)
+    return formatted + "+00:00"
+
+
+sync_clock()
+
+
+# Random per-boot prefix of action IDs, so IDs stay unique across reboots
+_id_prefix = "{:08x}".format(int.from_bytes(os.urandom(4), "big"))
+_id_counter = 0
+
+
+def new_id():
+    """
+    Get a new unique ID, i.e. for an action.
+
+    IDs are a random per-boot prefix followed by a counter, so they are short,
+    cheap to make, and sort in creation order within a boot.
+
+    Returns the ID as a string.
+    """
+    global _id_counter
+    _id_counter += 1
+    return "{}{:06x}".format(_id_prefix, _id_counter)
+
+
+def parse_id(id_):
+    """
+    Get the counter an ID was made from.
+
+    id_ -- an ID returned by new_id()
+
+    Returns the counter, or None if the ID wasn't made since this boot.
+    """
+    if len(id_) < 9 or not id_.startswith(_id_prefix):
+        return None
+    try:
+        return int(id_[8:], 16)
+    except ValueError:
+        return None
+
+
+def make_description(metadata, links):
+    """
+    Build the description of an interaction from its metadata.
+
+    The metadata is copied shallowly: nested values are shared, and the
+    result is meant to be built once and then served by reference.
+
+    metadata -- metadata dict, i.e. type, description, etc.
+    links -- links to add to any links in the metadata
+
+    Returns the description as a dictionary.
     """
-    now = time.localtime()
-    return "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}+00:00".format(*now[:6])
+    description = dict(metadata)
+    description["links"] = list(metadata.get("links", ())) + links
+    return description
 
 
 def get_addresses():
@@ -12,9 +12,19 @@ class Value(EventEmitter):
 
     Notifies all observers when the underlying value changes through an
     external update (command to turn the light off) or if the underlying sensor
-    reports a new value.
+    reports a new value. Observers of the "update" event are called with the
+    Value itself.
     """
 
+    __slots__ = (
+        "_value",
+        "read_forwarder",
+        "write_forwarder",
+        "history",
+        "rollups",
+        "owner",
+    )
+
     def __init__(self, initial_value=None, read_forwarder=None, write_forwarder=None):
         """
         Initialize the object.
@@ -27,6 +37,11 @@ class Value(EventEmitter):
         self._value = initial_value
         self.read_forwarder = read_forwarder
         self.write_forwarder = write_forwarder
+        # Optional History and Rollups recording every new value
+        self.history = None
+        self.rollups = None
+        # The Property this is the value of, if any
+        self.owner = None
 
     @property
     def readonly(self):
@@ -61,4 +76,8 @@ class Value(EventEmitter):
         """
         if value is not None and value != self._value:
             self._value = value
-            self.emit("update", value)
+            if self.history is not None:
+                self.history.record(value)
+            if self.rollups is not None:
+                self.rollups.record(value)
+            self.emit("update", self)